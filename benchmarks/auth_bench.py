@@ -0,0 +1,63 @@
+"""Per-request cost of the auth dependency with and without the
+verified token cache.
+
+Token versions are put into their cache up front, so neither path
+touches the database and only decoding plus the lookups are measured.
+For example:
+
+    python -m benchmarks.auth_bench --iterations 20000
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict
+
+from benchmarks.utils import write_results
+from src.security import create_access_token
+from src.users.actions.auth_actions import get_token_claims
+from src.users.caches import (
+    cache_token_version,
+    token_version_cache,
+    verified_token_cache,
+)
+
+
+def _make_token() -> str:
+    cache_token_version(1, 0)
+    return create_access_token(
+        data={"sub": "bench@bench.ru", "uid": 1, "adm": False, "ver": 0},
+    )
+
+
+async def _measure(token: str, iterations: int, cold: bool) -> Dict:
+    verified_token_cache.clear()
+    verified_token_cache.hits = verified_token_cache.misses = 0
+    elapsed = 0.0
+    for _ in range(iterations):
+        if cold:
+            verified_token_cache.clear()
+        started = time.perf_counter()
+        await get_token_claims(token=token, session=None)
+        elapsed += time.perf_counter() - started
+    return {"request_us": round(elapsed / iterations * 1e6, 2)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", default="auth_bench.json")
+    args = parser.parse_args()
+
+    if not (verified_token_cache.enabled and token_version_cache.enabled):
+        parser.error("token caches are disabled in settings")
+    token = _make_token()
+    results = {
+        "cold": await _measure(token, args.iterations, cold=True),
+        "warm": await _measure(token, args.iterations, cold=False),
+        "warm_cache": verified_token_cache.stats(),
+    }
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
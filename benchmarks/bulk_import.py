@@ -0,0 +1,66 @@
+"""Throughput of POST /private/users/bulk in rows per second.
+
+Runs against a live server with an existing admin, for example:
+
+    python -m benchmarks.bulk_import --login admin@admin.ru \
+        --password admin --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from httpx import AsyncClient
+
+from benchmarks.utils import write_results
+
+
+def _generate_rows(count: int, prefix: str) -> bytes:
+    return b"\n".join(
+        json.dumps({
+            "first_name": "bench",
+            "last_name": "bench",
+            "email": f"bulk-{prefix}-{index}@bench.ru",
+            "is_admin": False,
+            "password": "bench",
+        }).encode()
+        for index in range(count)
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://0.0.0.0:8000")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--output", default="bulk_import.json")
+    args = parser.parse_args()
+
+    body = _generate_rows(args.rows, uuid.uuid4().hex[:8])
+    async with AsyncClient(base_url=args.base_url, timeout=None) as client:
+        login = await client.post(
+            "/login", json={"login": args.login, "password": args.password},
+        )
+        login.raise_for_status()
+        started = time.perf_counter()
+        response = await client.post(
+            "/private/users/bulk",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    report = response.json()
+    write_results(args.output, {
+        "rows": args.rows,
+        "created": report["created"],
+        "failed": report["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_second": round(args.rows / elapsed, 2),
+    })
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
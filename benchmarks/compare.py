@@ -0,0 +1,37 @@
+"""Print latency and throughput changes between two result files.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)["routes"]
+    with open(args.after) as f:
+        after = json.load(f)["routes"]
+
+    for route in sorted(set(before) & set(after)):
+        changes = ", ".join(
+            f"{metric} {before[route][metric]} -> {after[route][metric]} "
+            f"({_change(before[route][metric], after[route][metric])})"
+            for metric in METRICS
+        )
+        print(f"{route}: {changes}")
+
+
+if __name__ == "__main__":
+    main()
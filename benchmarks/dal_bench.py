@@ -0,0 +1,168 @@
+"""Timings and EXPLAIN (ANALYZE, BUFFERS) plans of UserDAL methods.
+
+Every iteration runs in a transaction that is rolled back, so update and
+delete cases leave the seeded data untouched. Seed first with
+benchmarks.seed, then for example:
+
+    python -m benchmarks.dal_bench --iterations 200 --output dal.json
+
+Plans list the relations read by sequential scans, so a missing index
+shows up as a non-empty seq_scans list.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.seed import SEED_EMAIL_DOMAIN
+from benchmarks.utils import summarize, write_results
+from src import settings
+from src.users.dals import UserDAL
+
+
+Case = Callable[[UserDAL], Awaitable]
+
+
+def _seq_scans(plan: Dict) -> List[str]:
+    scans = []
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        scans += _seq_scans(child)
+    return scans
+
+
+def _build_cases(total: int, size: int, sample_id: int) -> Dict[str, Case]:
+    deep_page = max(1, total // size)
+    middle = total // 2
+    return {
+        "get_users page 1": lambda dal: dal.get_users(page=1, size=size),
+        "get_users deep page": lambda dal: dal.get_users(
+            page=deep_page, size=size,
+        ),
+        "get_users_with_total page 1": lambda dal: dal.get_users_with_total(
+            page=1, size=size,
+        ),
+        "get_users_with_total deep page": lambda dal: (
+            dal.get_users_with_total(page=deep_page, size=size)
+        ),
+        "get_users_after deep cursor": lambda dal: dal.get_users_after(
+            after_id=sample_id, size=size,
+        ),
+        "get_total_users_count": lambda dal: dal.get_total_users_count(),
+        "get_estimated_users_count": lambda dal: (
+            dal.get_estimated_users_count()
+        ),
+        "get_user_by_email": lambda dal: dal.get_user_by_email(
+            f"user{middle}@{SEED_EMAIL_DOMAIN}",
+        ),
+        "get_user_by_phone": lambda dal: dal.get_user_by_phone(
+            f"+7{middle:010d}",
+        ),
+        "update_user": lambda dal: dal.update_user(
+            sample_id, {"first_name": "bench"},
+        ),
+        "delete_user": lambda dal: dal.delete_user(sample_id),
+    }
+
+
+async def _explain(session: AsyncSession,
+                   statements: List[Tuple[str, tuple]]) -> List[Dict]:
+    plans = []
+    transaction = await session.begin()
+    connection = await session.connection()
+    try:
+        for statement, parameters in statements:
+            res = await connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}",
+                parameters,
+            )
+            plan = res.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plans.append({
+                "statement": statement,
+                "execution_ms": plan[0]["Execution Time"],
+                "seq_scans": _seq_scans(plan[0]["Plan"]),
+                "plan": plan[0]["Plan"],
+            })
+    finally:
+        await transaction.rollback()
+    return plans
+
+
+async def _measure(session_maker, statements: List[Tuple[str, tuple]],
+                   case: Case, iterations: int) -> Dict:
+    samples: List[float] = []
+    started = time.perf_counter()
+    for iteration in range(iterations):
+        async with session_maker() as session:
+            transaction = await session.begin()
+            if iteration == 0:
+                statements.clear()
+            iteration_started = time.perf_counter()
+            await case(UserDAL(session))
+            samples.append(time.perf_counter() - iteration_started)
+            if iteration == 0:
+                captured = list(statements)
+            await transaction.rollback()
+    result = summarize(samples, time.perf_counter() - started)
+    async with session_maker() as session:
+        result["plans"] = await _explain(session, captured)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.REAL_DATABASE_URL)
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--only", action="append")
+    parser.add_argument("--output", default="dal_bench.json")
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.database_url, future=True)
+    statements: List[Tuple[str, tuple]] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture_statement(conn, cursor, statement, parameters,
+                          context, executemany):
+        statements.append((statement, parameters))
+
+    session_maker = sessionmaker(
+        engine, expire_on_commit=False, class_=AsyncSession,
+    )
+    async with session_maker() as session:
+        async with session.begin():
+            user_dal = UserDAL(session)
+            total = await user_dal.get_total_users_count()
+            users = await user_dal.get_users(
+                page=max(1, total // 2), size=1,
+            )
+    sample_id = users[0].id if users else 1
+
+    results = {"meta": {"active_users": total, "size": args.size}}
+    for name, case in _build_cases(total, args.size, sample_id).items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        results[name] = await _measure(
+            session_maker, statements, case, args.iterations,
+        )
+        seq_scans = sorted({
+            relation
+            for plan in results[name]["plans"]
+            for relation in plan["seq_scans"]
+        })
+        print(f"{name}: p50 {results[name]['p50_ms']} ms, "
+              f"seq scans {seq_scans or 'none'}", flush=True)
+    await engine.dispose()
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
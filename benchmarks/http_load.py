@@ -0,0 +1,158 @@
+"""Concurrent HTTP load against every endpoint of a running server.
+
+Seed the database first with benchmarks.seed, then for example:
+
+    python -m benchmarks.http_load --concurrency 32 --requests 2000 \
+        --output results/$(git rev-parse --short HEAD).json
+
+Compare two runs with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import subprocess
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient, Response
+
+from benchmarks.seed import SEED_ADMIN_EMAIL, SEED_PASSWORD
+from benchmarks.utils import summarize, write_results
+
+
+Scenario = Callable[[AsyncClient, int], Awaitable[Response]]
+
+
+async def _drive(client: AsyncClient, scenario: Scenario,
+                 requests: int, concurrency: int) -> Dict:
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    indexes = iter(range(requests))
+
+    async def worker():
+        for index in indexes:
+            started = time.perf_counter()
+            response = await scenario(client, index)
+            samples.append(time.perf_counter() - started)
+            code = str(response.status_code)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(samples, time.perf_counter() - started)
+    result["statuses"] = statuses
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> Dict:
+    run_id = uuid.uuid4().hex[:8]
+    async with AsyncClient(base_url=args.base_url, timeout=60) as client:
+        login = {"login": args.login, "password": args.password}
+        (await client.post("/login", json=login)).raise_for_status()
+
+        first_page = (await client.get(
+            "/private/users", params={"size": 100},
+        )).json()
+        user_ids = [user["id"] for user in first_page["data"]]
+        size = 20
+        deep_page = max(1, first_page["meta"]["pagination"]["total"] // size)
+        created_ids: List[int] = []
+
+        async def create_user(client, index):
+            response = await client.post("/private/users", json={
+                "first_name": "load",
+                "last_name": "load",
+                "email": f"load-{run_id}-{index}@bench.ru",
+                "is_admin": False,
+                "password": "load",
+            })
+            if response.status_code == 201:
+                created_ids.append(response.json()["id"])
+            return response
+
+        scenarios: Dict[str, Scenario] = {
+            "POST /login": lambda client, index: client.post(
+                "/login", json=login,
+            ),
+            "GET /users/": lambda client, index: client.get(
+                "/users/", params={"size": size},
+            ),
+            "GET /users/ deep page": lambda client, index: client.get(
+                "/users/", params={"page": deep_page, "size": size},
+            ),
+            "GET /users/current": lambda client, index: client.get(
+                "/users/current",
+            ),
+            "GET /private/users": lambda client, index: client.get(
+                "/private/users", params={"size": size},
+            ),
+            "GET /private/users/{user_id}": lambda client, index: client.get(
+                f"/private/users/{user_ids[index % len(user_ids)]}",
+            ),
+            "POST /private/users": create_user,
+            "PATCH /private/users/{user_id}": lambda client, index: (
+                client.patch(
+                    f"/private/users/{created_ids[index % len(created_ids)]}",
+                    json={
+                        "id": created_ids[index % len(created_ids)],
+                        "first_name": f"patched{index}",
+                    },
+                )
+            ),
+            "DELETE /private/users/{user_id}": lambda client, index: (
+                client.delete(
+                    f"/private/users/{created_ids[index % len(created_ids)]}",
+                )
+            ),
+        }
+        routes = {}
+        for name, scenario in scenarios.items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            if "{user_id}" in name and name.startswith(("PATCH", "DELETE")) \
+                    and not created_ids:
+                continue
+            routes[name] = await _drive(
+                client, scenario, args.requests, args.concurrency,
+            )
+            print(f"{name}: p99 {routes[name]['p99_ms']} ms", flush=True)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "deep_page": deep_page,
+        },
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://0.0.0.0:8000")
+    parser.add_argument("--login", default=SEED_ADMIN_EMAIL)
+    parser.add_argument("--password", default=SEED_PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--only", action="append",
+        help="run only routes whose name contains this text",
+    )
+    parser.add_argument("--output", default="http_load.json")
+    args = parser.parse_args()
+    write_results(args.output, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Round trips and latency of the users list: count + page vs one query.
+
+Runs against the database from REAL_DATABASE_URL, for example:
+
+    python -m benchmarks.list_round_trips --page 1 --page 500 --size 20
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.utils import summarize, write_results
+from src import settings
+from src.users.dals import UserDAL
+
+
+async def _two_queries(user_dal: UserDAL, page: int, size: int):
+    await user_dal.get_total_users_count()
+    await user_dal.get_users(page=page, size=size)
+
+
+async def _single_query(user_dal: UserDAL, page: int, size: int):
+    await user_dal.get_users_with_total(page=page, size=size)
+
+
+async def _measure(session_maker, statements: List[int], path, page, size,
+                   iterations: int) -> Dict:
+    samples: List[float] = []
+    statements.clear()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        async with session_maker() as session:
+            async with session.begin():
+                iteration_started = time.perf_counter()
+                await path(UserDAL(session), page, size)
+                samples.append(time.perf_counter() - iteration_started)
+    result = summarize(samples, time.perf_counter() - started)
+    result["round_trips_per_request"] = len(statements) / iterations
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.REAL_DATABASE_URL)
+    parser.add_argument("--page", type=int, action="append")
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", default="list_round_trips.json")
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.database_url, future=True)
+    statements: List[int] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(*_):
+        statements.append(1)
+
+    session_maker = sessionmaker(
+        engine, expire_on_commit=False, class_=AsyncSession,
+    )
+    results = {}
+    for page in args.page or [1]:
+        results[f"page_{page}"] = {
+            "two_queries": await _measure(
+                session_maker, statements, _two_queries,
+                page, args.size, args.iterations,
+            ),
+            "single_query": await _measure(
+                session_maker, statements, _single_query,
+                page, args.size, args.iterations,
+            ),
+        }
+    await engine.dispose()
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
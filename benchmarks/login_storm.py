@@ -0,0 +1,73 @@
+"""p99 of GET /users/ with and without concurrent logins.
+
+Runs against a live server, for example:
+
+    python -m benchmarks.login_storm --base-url http://0.0.0.0:8000 \
+        --login admin@admin.ru --password admin
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from httpx import AsyncClient
+
+from benchmarks.utils import summarize, write_results
+
+
+async def _read_users(
+        client: AsyncClient, duration: float, samples: List[float]):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/users/")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def _login_storm(
+        client: AsyncClient, duration: float, login: str, password: str):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await client.post(
+            "/login", json={"login": login, "password": password},
+        )
+
+
+async def _run_phase(args, with_storm: bool):
+    samples: List[float] = []
+    async with AsyncClient(base_url=args.base_url, timeout=60) as client:
+        tasks = [
+            _read_users(client, args.duration, samples)
+            for _ in range(args.readers)
+        ]
+        if with_storm:
+            tasks += [
+                _login_storm(client, args.duration, args.login, args.password)
+                for _ in range(args.logins)
+            ]
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        return summarize(samples, time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://0.0.0.0:8000")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--output", default="login_storm.json")
+    args = parser.parse_args()
+
+    results = {
+        "baseline": await _run_phase(args, with_storm=False),
+        "login_storm": await _run_phase(args, with_storm=True),
+    }
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Seed a benchmark dataset of users and cities.
+
+All seeded users share one password hash, so seeding a million rows does
+not spend hours in bcrypt. For example:
+
+    python -m benchmarks.seed --users 100000 --cities 300
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import settings
+from src.security import Hasher
+from src.users.dals import UserDAL, CityDAL
+
+
+SEED_EMAIL_DOMAIN: str = "bench.ru"
+SEED_PASSWORD: str = "bench"
+SEED_ADMIN_EMAIL: str = f"admin@{SEED_EMAIL_DOMAIN}"
+
+
+def _seed_user(index: int, city_ids, hashed_password: str) -> dict:
+    return {
+        "first_name": f"first{index}",
+        "last_name": f"last{index}",
+        "other_name": None,
+        "email": f"user{index}@{SEED_EMAIL_DOMAIN}",
+        "phone": f"+7{index:010d}",
+        "birthday": None,
+        "city": city_ids[index % len(city_ids)] if city_ids else None,
+        "additional_info": None,
+        "is_admin": False,
+        "hashed_password": hashed_password,
+    }
+
+
+async def seed(database_url: str, users: int, cities: int, batch_size: int):
+    engine = create_async_engine(database_url, future=True)
+    session_maker = sessionmaker(
+        engine, expire_on_commit=False, class_=AsyncSession,
+    )
+    hashed_password = Hasher.get_password_hash(SEED_PASSWORD)
+    started = time.perf_counter()
+    async with session_maker() as session:
+        city_ids = list((await CityDAL(session).bulk_upsert(
+            [f"City {index}" for index in range(cities)]
+        )).values())
+        user_dal = UserDAL(session)
+        await user_dal.create_users([{
+            **_seed_user(0, [], hashed_password),
+            "email": SEED_ADMIN_EMAIL,
+            "phone": None,
+            "is_admin": True,
+        }])
+        await session.commit()
+        for start in range(0, users, batch_size):
+            await user_dal.create_users([
+                _seed_user(index, city_ids, hashed_password)
+                for index in range(start, min(start + batch_size, users))
+            ])
+            await session.commit()
+    await engine.dispose()
+    print(
+        f"Seeded {users} users and {cities} cities "
+        f"in {time.perf_counter() - started:.1f}s, "
+        f"admin {SEED_ADMIN_EMAIL} / {SEED_PASSWORD}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.REAL_DATABASE_URL)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(seed(
+        args.database_url, args.users, args.cities, args.batch_size,
+    ))
+
+
+if __name__ == "__main__":
+    main()
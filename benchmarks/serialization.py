@@ -0,0 +1,105 @@
+"""Per-row cost of serialising a users list page, pydantic vs fast path.
+
+The pydantic path builds a model per row, lets FastAPI re-validate the
+page against response_model and renders it with the stdlib json module.
+The fast path dumps plain dicts with orjson. Both must produce the same
+bytes. For example:
+
+    python -m benchmarks.serialization --rows 20 --rows 1000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from benchmarks.utils import write_results
+from src.responses import dump_many
+from src.users.schemas.users_schemas import (
+    PaginatedMetaDataModel,
+    UsersListElementModel,
+    UsersListMetaDataModel,
+    UsersListResponseModel,
+)
+
+
+RESPONSE_FIELD = create_response_field(
+    name="response", type_=UsersListResponseModel,
+)
+
+
+def _rows(count: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=index,
+            first_name=f"Имя{index}",
+            last_name=f"Фамилия{index}",
+            email=f"user{index}@bench.ru",
+        )
+        for index in range(count)
+    ]
+
+
+async def _pydantic_path(rows, meta: PaginatedMetaDataModel) -> bytes:
+    model = UsersListResponseModel(
+        data=[
+            UsersListElementModel(
+                id=row.id,
+                first_name=row.first_name,
+                last_name=row.last_name,
+                email=row.email,
+            )
+            for row in rows
+        ],
+        meta=UsersListMetaDataModel(pagination=meta),
+    )
+    content = await serialize_response(
+        field=RESPONSE_FIELD, response_content=model,
+    )
+    return JSONResponse(content=content).body
+
+
+async def _fast_path(rows, meta: PaginatedMetaDataModel) -> bytes:
+    return ORJSONResponse(content={
+        "data": dump_many(rows, UsersListElementModel),
+        "meta": {"pagination": meta.dict()},
+    }).body
+
+
+async def _measure(path, rows, meta, iterations: int) -> Dict:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await path(rows, meta)
+    elapsed = time.perf_counter() - started
+    return {
+        "page_us": round(elapsed / iterations * 1e6, 2),
+        "row_us": round(elapsed / iterations / len(rows) * 1e6, 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, action="append")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", default="serialization.json")
+    args = parser.parse_args()
+
+    results = {}
+    for count in args.rows or [20, 1000]:
+        rows = _rows(count)
+        meta = PaginatedMetaDataModel(total=count, page=1, size=count)
+        assert await _pydantic_path(rows, meta) == await _fast_path(rows, meta)
+        iterations = max(10, args.iterations * 20 // count)
+        results[f"{count}_rows"] = {
+            "pydantic": await _measure(_pydantic_path, rows, meta, iterations),
+            "fast": await _measure(_fast_path, rows, meta, iterations),
+        }
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+import json
+import statistics
+import time
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """Latency samples are seconds, the summary is milliseconds"""
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+
+
+def write_results(path: str, results: Dict) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+    print(json.dumps(results, indent=2, ensure_ascii=False, sort_keys=True))
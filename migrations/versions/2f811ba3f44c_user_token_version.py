@@ -0,0 +1,29 @@
+"""user token version
+
+Revision ID: 2f811ba3f44c
+Revises: 6369561197b4
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f811ba3f44c'
+down_revision = '6369561197b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user',
+        sa.Column(
+            'token_version', sa.Integer(), server_default='0', nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'token_version')
@@ -0,0 +1,48 @@
+"""user active indexes
+
+Revision ID: a3c51d27e9b0
+Revises: 2f811ba3f44c
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c51d27e9b0'
+down_revision = '2f811ba3f44c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can not run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_active_id', 'user', ['id'], unique=False,
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_user_id', table_name='user', postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_city_id', table_name='city', postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_city_id', 'city', ['id'], unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_user_id', 'user', ['id'], unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_user_active_id', table_name='user',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,27 @@
+"""user version
+
+Revision ID: d8e24b6f1c57
+Revises: a3c51d27e9b0
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e24b6f1c57'
+down_revision = 'a3c51d27e9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'version')
@@ -12,7 +12,7 @@ async def create_admin():
     last_name = input("Enter last name: ")
     email = input("Enter email: ")
     password = getpass("Enter password: ")
-    hashed_password = Hasher.get_password_hash(password)
+    hashed_password = await Hasher.get_password_hash_async(password)
 
     async with async_session() as session:
         user_dal = UserDAL(session)
@@ -33,5 +33,12 @@ async def create_admin():
         print(f"Admin user created with ID: {admin.id}")
 
 
+async def main():
+    try:
+        await create_admin()
+    finally:
+        Hasher.shutdown()
+
+
 if __name__ == "__main__":
-    asyncio.run(create_admin())
+    asyncio.run(main())
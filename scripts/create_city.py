@@ -1,4 +1,8 @@
+import argparse
 import asyncio
+import sys
+from itertools import islice
+from typing import Iterator, List, TextIO
 
 from src.database import async_session
 from src.users.dals import CityDAL
@@ -14,5 +18,48 @@ async def create_city():
         await session.refresh(city)
         print(f"City created with ID: {city.id}")
 
+
+def read_batches(source: TextIO, batch_size: int) -> Iterator[List[str]]:
+    names = (line.strip() for line in source)
+    names = (name for name in names if name)
+    while True:
+        batch = list(islice(names, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def load_cities(source: TextIO, batch_size: int):
+    total = 0
+    async with async_session() as session:
+        city_dal = CityDAL(session)
+        for batch in read_batches(source, batch_size):
+            ids = await city_dal.bulk_upsert(batch, batch_size=batch_size)
+            await session.commit()
+            total += len(ids)
+            print(f"Loaded {total} cities", file=sys.stderr)
+    print(f"Cities loaded: {total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a city interactively or load city names, "
+                    "one per line, from a file or stdin.",
+    )
+    parser.add_argument(
+        "--file", help="path to a file with city names, '-' for stdin",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.file is None:
+        asyncio.run(create_city())
+    elif args.file == "-":
+        asyncio.run(load_cities(sys.stdin, args.batch_size))
+    else:
+        with open(args.file, encoding="utf-8") as source:
+            asyncio.run(load_cities(source, args.batch_size))
+
+
 if __name__ == "__main__":
-    asyncio.run(create_city())
+    main()
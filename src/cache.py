@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry time to live.
+
+    Not shared between workers, every uvicorn process keeps its own copy.
+    A ttl or maxsize of zero disables the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_with_ttl(key, default)[1]
+
+    def get_with_ttl(
+            self, key: Hashable, default: Any = None) -> Tuple[float, Any]:
+        """Seconds the entry has left and its value, 0 and default
+        for a miss"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return 0, default
+        expires_at, value = entry
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            del self._data[key]
+            self.misses += 1
+            return 0, default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return remaining, value
+
+    def set(self, key: Hashable, value: Any,
+            ttl: Optional[float] = None) -> None:
+        """ttl may only shorten the cache-wide one for this entry"""
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
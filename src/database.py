@@ -1,22 +1,188 @@
-from typing import Generator
+import asyncio
+import inspect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Generator, TypeVar
 
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from src.settings import REAL_DATABASE_URL
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.util import await_only
+from src import settings
+from src.metrics import register_query_metrics
+from src.pool_stats import (
+    InstrumentedPool,
+    ReplicaInstrumentedPool,
+    register_pool_events,
+    replica_pool_stats,
+)
+from src.slow_query_log import register_slow_query_log
+
 
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+AFTER_COMMIT_KEY: str = "after_commit_callbacks"
+USED_REPLICA_KEY: str = "used_replica"
 
 Base = declarative_base()
 
 engine = create_async_engine(
-    REAL_DATABASE_URL, future=True, echo=True,
+    settings.REAL_DATABASE_URL,
+    future=True,
+    echo=settings.DB_ECHO,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
 )
+register_pool_events(engine.sync_engine)
+register_query_metrics(engine.sync_engine)
+register_slow_query_log(engine.sync_engine)
 
 async_session = sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession,
 )
 
 
+def run_after_commit(session: AsyncSession, callback: Callable) -> None:
+    """Run callback once the session's transaction has committed, so
+    concurrent readers can not re-cache rows that are about to change.
+    Dropped when the transaction rolls back. Async callbacks are awaited
+    from the commit's greenlet."""
+    session.sync_session.info.setdefault(AFTER_COMMIT_KEY, []).append(
+        callback,
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop(AFTER_COMMIT_KEY, ()):
+        try:
+            result = callback()
+            if inspect.isawaitable(result):
+                await_only(result)
+        except Exception:
+            # the data is committed already, a cache that could not be
+            # invalidated only stays stale until its ttl runs out
+            logger.exception("after commit callback failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(session):
+    session.info.pop(AFTER_COMMIT_KEY, None)
+
+# Without READ_DATABASE_URL reads share the primary engine. With it, even
+# when it points at the same database, reads get their own pool.
+if settings.READ_DATABASE_URL:
+    read_engine = create_async_engine(
+        settings.READ_DATABASE_URL,
+        future=True,
+        echo=settings.DB_ECHO,
+        poolclass=ReplicaInstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"timeout": settings.READ_DATABASE_CONNECT_TIMEOUT},
+    )
+    register_pool_events(read_engine.sync_engine, replica_pool_stats)
+    register_query_metrics(read_engine.sync_engine)
+    register_slow_query_log(read_engine.sync_engine)
+else:
+    read_engine = engine
+
+wrote_to_primary: ContextVar[bool] = ContextVar(
+    "wrote_to_primary", default=False,
+)
+_replica_down_until: float = 0.0
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _remember_write(conn, cursor, statement, parameters, context, executemany):
+    # each request runs in its own copy of the context, so the flag
+    # only pins the rest of the request that wrote
+    if context.isinsert or context.isupdate or context.isdelete:
+        wrote_to_primary.set(True)
+
+
+def _replica_available() -> bool:
+    return (
+        read_engine is not engine
+        and not wrote_to_primary.get()
+        and time.monotonic() >= _replica_down_until
+    )
+
+
+def _mark_replica_down() -> None:
+    global _replica_down_until
+    _replica_down_until = (
+        time.monotonic() + settings.READ_DATABASE_RETRY_SECONDS
+    )
+
+
+def _is_replica_failure(exc: Exception) -> bool:
+    """Lost or refused connections and replica side cancellations,
+    not errors in the statement itself"""
+    if isinstance(exc, (OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, DBAPIError) and (
+        exc.connection_invalidated
+        or isinstance(exc, (OperationalError, InterfaceError))
+    )
+
+
+class ReadRoutingSession(Session):
+    """Reads go to the replica, unless the request has already written
+    to the primary or the replica was found down. Writes issued through
+    this session still go to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or not _replica_available()
+        ):
+            return engine.sync_engine
+        self.info[USED_REPLICA_KEY] = True
+        return read_engine.sync_engine
+
+
+read_session = sessionmaker(
+    expire_on_commit=False,
+    class_=AsyncSession,
+    sync_session_class=ReadRoutingSession,
+)
+
+
+def used_replica(session: AsyncSession) -> bool:
+    """Whether a statement of the session's current read went to the
+    replica, whose rows may lag behind the primary"""
+    return session.sync_session.info.get(USED_REPLICA_KEY, False)
+
+
+async def read_with_fallback(
+        session: AsyncSession, read: Callable[[], Awaitable[T]]) -> T:
+    """Run read, and once more on the primary when the replica failed
+    under it. read has to open its own transaction on the session."""
+    session.sync_session.info.pop(USED_REPLICA_KEY, None)
+    try:
+        return await read()
+    except Exception as exc:
+        used_replica = session.sync_session.info.pop(USED_REPLICA_KEY, False)
+        if not (used_replica and _is_replica_failure(exc)):
+            raise
+    _mark_replica_down()
+    await session.close()
+    return await read()
+
+
 async def get_db() -> Generator:
     """Dependency for getting async session"""
     try:
@@ -24,3 +190,13 @@ async def get_db() -> Generator:
         yield session
     finally:
         await session.close()
+
+
+async def get_read_db() -> Generator:
+    """Dependency for getting async session for reads,
+    on the replica when READ_DATABASE_URL is set"""
+    try:
+        session: AsyncSession = read_session()
+        yield session
+    finally:
+        await session.close()
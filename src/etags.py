@@ -0,0 +1,42 @@
+import hashlib
+from typing import List, Optional
+
+from fastapi.responses import Response
+from starlette import status
+
+
+def make_etag(value: str) -> str:
+    return f'W/"{value}"'
+
+
+def make_digest_etag(*parts) -> str:
+    """Weak ETag of a representation built from plain values,
+    e.g. the (id, version) pairs of a page"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return make_etag(digest.hexdigest())
+
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    """Opaque tags of an If-Match or If-None-Match header,
+    without the weak prefix and the quotes"""
+    if not header:
+        return []
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tags.append(tag.strip('"'))
+    return tags
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    tags = parse_etags(header)
+    return "*" in tags or parse_etags(etag)[0] in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag},
+    )
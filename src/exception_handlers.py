@@ -32,3 +32,14 @@ async def internal_server_error_handler(request: Request, exc: HTTPException):
             "message": "Что-то пошло не так, мы уже исправляем эту ошибку",
         },
     )
+
+
+async def password_hasher_unavailable_handler(
+        request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "code": status.HTTP_503_SERVICE_UNAVAILABLE,
+            "message": "Сервис перегружен, попробуйте позже",
+        },
+    )
@@ -1,7 +1,11 @@
 import uvicorn
 
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import ORJSONResponse, Response
 
+from src.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from src.security import Hasher, PasswordHasherUnavailable
+from src.users.caches import users_list_cache
 from src.users.routers.auth_router import auth_router
 from src.users.routers.private_router import private_router
 from src.users.routers.users_router import users_router
@@ -10,10 +14,11 @@ from src.exception_handlers import (
     custom_401_403_404_exception_handler,
     custom_422_exception_handler,
     internal_server_error_handler,
+    password_hasher_unavailable_handler,
 )
 
 
-app = FastAPI(title="kefir_test")
+app = FastAPI(title="kefir_test", default_response_class=ORJSONResponse)
 
 
 main_api_router = APIRouter()
@@ -26,12 +31,32 @@ main_api_router.include_router(
 main_api_router.include_router(
     users_router, prefix="/users", tags=["users"])
 app.include_router(main_api_router)
+app.add_middleware(MetricsMiddleware)
 app.add_exception_handler(400, custom_400_exception_handler)
 app.add_exception_handler(401, custom_401_403_404_exception_handler)
 app.add_exception_handler(403, custom_401_403_404_exception_handler)
 app.add_exception_handler(404, custom_401_403_404_exception_handler)
+app.add_exception_handler(412, custom_400_exception_handler)
 app.add_exception_handler(422, custom_422_exception_handler)
 app.add_exception_handler(500, internal_server_error_handler)
+app.add_exception_handler(
+    PasswordHasherUnavailable, password_hasher_unavailable_handler
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.on_event("shutdown")
+async def shutdown_password_hasher():
+    Hasher.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_response_cache():
+    await users_list_cache.close()
 
 
 if __name__ == "__main__":
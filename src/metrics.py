@@ -0,0 +1,192 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+UNMATCHED_ROUTE: str = "unmatched"
+NO_ROUTE: str = "none"
+CONTENT_TYPE: str = "text/plain; version=0.0.4"
+
+request_scope: ContextVar[Optional[dict]] = ContextVar(
+    "request_scope", default=None,
+)
+_route_paths: Dict[int, Dict] = {}
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{value}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in self._values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket..., count above last bucket, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        names = self.labelnames + ("le",)
+        for labels, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(names, labels + (str(bound),))} "
+                    f"{cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by method, route and status code.",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method and route.",
+    ("method", "route"),
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed by originating route.",
+    ("route",),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by originating route.",
+    ("route",),
+)
+REGISTRY = (HTTP_REQUESTS, HTTP_REQUEST_DURATION, DB_QUERIES, DB_QUERY_DURATION)
+
+
+def get_route_label(scope: Optional[dict]) -> str:
+    """Path template of the matched route, never the raw path,
+    so that label cardinality stays bounded"""
+    if scope is None:
+        return NO_ROUTE
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return UNMATCHED_ROUTE
+    paths = _route_paths.get(id(app))
+    if paths is None:
+        paths = _route_paths[id(app)] = {
+            route.endpoint: route.path
+            for route in app.routes
+            if hasattr(route, "endpoint")
+        }
+    return paths.get(endpoint, UNMATCHED_ROUTE)
+
+
+def get_current_route() -> str:
+    return get_route_label(request_scope.get())
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, BaseHTTPMiddleware would add a task and
+    a memory stream to every request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_scope.reset(token)
+            route = get_route_label(scope)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route)
+
+
+def register_query_metrics(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters,
+                             context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        route = get_current_route()
+        DB_QUERIES.inc(route)
+        DB_QUERY_DURATION.observe(elapsed, route)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
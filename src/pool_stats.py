@@ -0,0 +1,90 @@
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+
+class PoolStats:
+    """Connection pool counters fed by pool events and InstrumentedPool"""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.acquires = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+
+    def record_acquire(self, seconds: float) -> None:
+        self.acquires += 1
+        self.acquire_seconds_total += seconds
+        if seconds > self.acquire_seconds_max:
+            self.acquire_seconds_max = seconds
+
+    def snapshot(self, pool: Pool) -> Dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "acquire_wait_seconds_total": self.acquire_seconds_total,
+            "acquire_wait_seconds_max": self.acquire_seconds_max,
+            "acquire_wait_seconds_avg": (
+                self.acquire_seconds_total / self.acquires
+                if self.acquires else 0.0
+            ),
+        }
+
+
+pool_stats = PoolStats()
+replica_pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times how long a checkout waits for a connection,
+    including opening a new one when the pool has room to grow"""
+
+    # a class attribute, so the pool keeps it when the engine recreates it
+    stats: PoolStats = pool_stats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record_acquire(time.perf_counter() - started)
+
+
+class ReplicaInstrumentedPool(InstrumentedPool):
+    stats = replica_pool_stats
+
+
+def register_pool_events(
+        engine: Engine, stats: PoolStats = pool_stats,
+) -> None:
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+
+def get_pool_stats(engine: Engine, stats: PoolStats = pool_stats) -> Dict:
+    return stats.snapshot(engine.pool)
@@ -0,0 +1,137 @@
+from typing import Dict, Optional, Tuple
+
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.types import Backend
+from redis.asyncio import Redis
+
+from src.cache import TTLCache
+
+
+class TTLCacheBackend(Backend):
+    """fastapi-cache backend over the bounded in-process TTLCache,
+    the bundled InMemoryBackend never drops keys nobody reads again"""
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        remaining, value = self.cache.get_with_ttl(key)
+        return int(remaining), value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    async def set(
+            self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        self.cache.set(key, value, ttl=expire)
+
+    async def clear(
+            self, namespace: Optional[str] = None,
+            key: Optional[str] = None) -> int:
+        if namespace:
+            count = self.cache.stats()["size"]
+            self.cache.clear()
+            return count
+        if key:
+            self.cache.pop(key)
+            return 1
+        return 0
+
+
+class ResponseCache:
+    """Serialised responses in a fastapi-cache backend, in-process by
+    default or in Redis when a URL is given.
+
+    Keys carry a generation number. Writes bump the generation instead of
+    deleting keys, entries of older generations are never read again and
+    expire on their own. The generation lives next to the entries, so
+    with Redis every worker sees a bump at once.
+    """
+
+    def __init__(self, namespace: str, ttl: int, maxsize: int,
+                 redis_url: str = ""):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.redis_url = redis_url
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._backend: Optional[Backend] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and (bool(self.redis_url) or self.maxsize > 0)
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.namespace}:generation"
+
+    def _get_backend(self) -> Backend:
+        if self._backend is None:
+            if self.redis_url:
+                self._backend = RedisBackend(Redis.from_url(self.redis_url))
+            else:
+                self._backend = TTLCacheBackend(
+                    TTLCache(maxsize=self.maxsize, ttl=self.ttl),
+                )
+        return self._backend
+
+    async def _get_generation(self) -> int:
+        backend = self._get_backend()
+        if isinstance(backend, RedisBackend):
+            return int(await backend.redis.get(self._generation_key) or 0)
+        return self._generation
+
+    async def get_key(self, *parts) -> Optional[str]:
+        """Key of the current generation, taken before the response is
+        built so that a write in between leaves the result unreachable"""
+        if not self.enabled:
+            return None
+        generation = await self._get_generation()
+        return ":".join(str(part) for part in (
+            self.namespace, generation, *parts,
+        ))
+
+    async def get(self, key: Optional[str]) -> Optional[bytes]:
+        if key is None:
+            return None
+        value = await self._get_backend().get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Optional[str], value: bytes,
+                  ttl: Optional[int] = None) -> None:
+        """ttl may only shorten the cache-wide one for this entry"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if key is None or ttl <= 0:
+            return
+        await self._get_backend().set(key, value, expire=ttl)
+
+    async def invalidate(self) -> None:
+        if not self.enabled:
+            return
+        backend = self._get_backend()
+        if isinstance(backend, RedisBackend):
+            await backend.redis.incr(self._generation_key)
+        else:
+            self._generation += 1
+
+    async def close(self) -> None:
+        if isinstance(self._backend, RedisBackend):
+            await self._backend.redis.close()
+        self._backend = None
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis_url else "memory",
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
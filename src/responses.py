@@ -0,0 +1,14 @@
+from typing import Any, Dict, Iterable, List, Type
+
+from pydantic import BaseModel
+
+
+def dump_fields(obj: Any, model: Type[BaseModel]) -> Dict[str, Any]:
+    """Response model fields read straight from a trusted ORM object or
+    row, without building and re-validating the pydantic model"""
+    return {name: getattr(obj, name) for name in model.__fields__}
+
+
+def dump_many(objs: Iterable[Any], model: Type[BaseModel]) -> List[Dict]:
+    names = tuple(model.__fields__)
+    return [{name: getattr(obj, name) for name in names} for obj in objs]
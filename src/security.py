@@ -1,6 +1,9 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from datetime import timedelta
-from typing import Optional
+from typing import List, Optional
 from passlib.context import CryptContext
 from jose import jwt
 
@@ -10,6 +13,10 @@ import src.settings as settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+class PasswordHasherUnavailable(Exception):
+    """Hashing pool is saturated or did not answer in time"""
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -25,11 +32,101 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_password_hash(plain_password: str) -> str:
+    return pwd_context.hash(plain_password)
+
+
 class Hasher:
+    _executor: Optional[ProcessPoolExecutor] = None
+    _slots: Optional[asyncio.Semaphore] = None
+
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return _verify_password(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(plain_password: str) -> str:
-        return pwd_context.hash(plain_password)
+        return _get_password_hash(plain_password)
+
+    @classmethod
+    async def verify_password_async(
+            cls, plain_password: str, hashed_password: str) -> bool:
+        return await cls._run(
+            _verify_password, plain_password, hashed_password
+        )
+
+    @classmethod
+    async def get_password_hash_async(cls, plain_password: str) -> str:
+        return await cls._run(_get_password_hash, plain_password)
+
+    @classmethod
+    async def get_password_hashes_async(
+            cls, plain_passwords: List[str]) -> List[str]:
+        """Hash a batch keeping at most pool size of it in flight,
+        so bulk work leaves the queue free for interactive logins"""
+        workers = asyncio.Semaphore(settings.PASSWORD_HASHER_POOL_SIZE)
+
+        async def hash_one(plain_password: str) -> str:
+            async with workers:
+                return await cls.get_password_hash_async(plain_password)
+
+        return list(await asyncio.gather(
+            *(hash_one(password) for password in plain_passwords)
+        ))
+
+    @classmethod
+    async def _run(cls, func, *args):
+        """Run bcrypt in the process pool without blocking the event loop.
+
+        At most pool size + queue size calls are in flight, everything
+        above that is rejected at once instead of piling up behind bcrypt.
+        A call that times out keeps its slot until the pool has actually
+        finished with it.
+        """
+        slots = cls._get_slots()
+        if slots.locked():
+            raise PasswordHasherUnavailable
+        await slots.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(cls._get_executor(), func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future),
+                settings.PASSWORD_HASHER_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            raise PasswordHasherUnavailable
+
+    @classmethod
+    def _get_slots(cls) -> asyncio.Semaphore:
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(
+                settings.PASSWORD_HASHER_POOL_SIZE
+                + settings.PASSWORD_HASHER_QUEUE_SIZE
+            )
+        return cls._slots
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHER_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+        cls._slots = None
@@ -14,7 +14,88 @@ REAL_DATABASE_URL = env.str(
     default="postgresql+asyncpg://postgres:postgres@db:5432/postgres",
 )
 
+READ_DATABASE_URL: str = env.str("READ_DATABASE_URL", default="")
+READ_DATABASE_CONNECT_TIMEOUT: float = env.float(
+    "READ_DATABASE_CONNECT_TIMEOUT", default=2.0,
+)
+READ_DATABASE_RETRY_SECONDS: float = env.float(
+    "READ_DATABASE_RETRY_SECONDS", default=10.0,
+)
+
+DB_POOL_SIZE: int = env.int("DB_POOL_SIZE", default=5)
+DB_MAX_OVERFLOW: int = env.int("DB_MAX_OVERFLOW", default=10)
+DB_POOL_TIMEOUT: float = env.float("DB_POOL_TIMEOUT", default=30.0)
+DB_POOL_RECYCLE: int = env.int("DB_POOL_RECYCLE", default=-1)
+DB_POOL_PRE_PING: bool = env.bool("DB_POOL_PRE_PING", default=False)
+
+DB_ECHO: bool = env.bool("DB_ECHO", default=False)
+SLOW_QUERY_THRESHOLD_MS: float = env.float(
+    "SLOW_QUERY_THRESHOLD_MS", default=200.0,
+)
+SLOW_QUERY_SAMPLE_RATE: float = env.float(
+    "SLOW_QUERY_SAMPLE_RATE", default=1.0,
+)
+SLOW_QUERY_LOG_PARAMETERS: bool = env.bool(
+    "SLOW_QUERY_LOG_PARAMETERS", default=False,
+)
+
 TEST_DATABASE_URL = env.str(
     "TEST_DATABASE_URL",
     default="postgresql+asyncpg://postgres_test:postgres_test@db_tests:5433/postgres_test",
 )
+
+PASSWORD_HASHER_POOL_SIZE: int = env.int("PASSWORD_HASHER_POOL_SIZE", default=2)
+PASSWORD_HASHER_QUEUE_SIZE: int = env.int(
+    "PASSWORD_HASHER_QUEUE_SIZE", default=64,
+)
+PASSWORD_HASHER_TIMEOUT_SECONDS: float = env.float(
+    "PASSWORD_HASHER_TIMEOUT_SECONDS", default=5.0,
+)
+
+AUTH_USER_CACHE_TTL_SECONDS: float = env.float(
+    "AUTH_USER_CACHE_TTL_SECONDS", default=30.0,
+)
+AUTH_USER_CACHE_MAXSIZE: int = env.int("AUTH_USER_CACHE_MAXSIZE", default=10000)
+
+USERS_COUNT_STRATEGY: str = env.str("USERS_COUNT_STRATEGY", default="exact")
+USERS_COUNT_CACHE_TTL_SECONDS: float = env.float(
+    "USERS_COUNT_CACHE_TTL_SECONDS", default=60.0,
+)
+
+CITY_HINTS_CACHE_TTL_SECONDS: float = env.float(
+    "CITY_HINTS_CACHE_TTL_SECONDS", default=3600.0,
+)
+CITY_HINTS_CACHE_MAXSIZE: int = env.int(
+    "CITY_HINTS_CACHE_MAXSIZE", default=10000,
+)
+
+USERS_BULK_CHUNK_SIZE: int = env.int("USERS_BULK_CHUNK_SIZE", default=500)
+
+USERS_EXPORT_CHUNK_SIZE: int = env.int("USERS_EXPORT_CHUNK_SIZE", default=1000)
+
+TOKEN_VERSION_CACHE_TTL_SECONDS: float = env.float(
+    "TOKEN_VERSION_CACHE_TTL_SECONDS", default=30.0,
+)
+TOKEN_VERSION_CACHE_MAXSIZE: int = env.int(
+    "TOKEN_VERSION_CACHE_MAXSIZE", default=100000,
+)
+
+VERIFIED_TOKEN_CACHE_MAXSIZE: int = env.int(
+    "VERIFIED_TOKEN_CACHE_MAXSIZE", default=10000,
+)
+VERIFIED_TOKEN_CACHE_TTL_SECONDS: float = env.float(
+    "VERIFIED_TOKEN_CACHE_TTL_SECONDS",
+    default=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+USERS_LIST_CACHE_TTL_SECONDS: int = env.int(
+    "USERS_LIST_CACHE_TTL_SECONDS", default=30,
+)
+USERS_LIST_CACHE_MAXSIZE: int = env.int(
+    "USERS_LIST_CACHE_MAXSIZE", default=1000,
+)
+# pages read from a lagging replica may predate the last write
+USERS_LIST_CACHE_REPLICA_TTL_SECONDS: int = env.int(
+    "USERS_LIST_CACHE_REPLICA_TTL_SECONDS", default=2,
+)
+RESPONSE_CACHE_REDIS_URL: str = env.str("RESPONSE_CACHE_REDIS_URL", default="")
@@ -0,0 +1,53 @@
+import logging
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import settings
+from src.metrics import get_current_route
+
+
+logger = logging.getLogger(__name__)
+REDACTED: str = "<redacted>"
+
+
+def _get_row_count(cursor) -> int:
+    """asyncpg reports rowcount -1 for row returning statements, whose
+    rows are already fetched into the adapted cursor by now."""
+    rows = getattr(cursor, "_rows", None)
+    if cursor.description is not None and isinstance(rows, list):
+        return len(rows)
+    return cursor.rowcount
+
+
+def register_slow_query_log(engine: Engine) -> None:
+    """Log statements slower than SLOW_QUERY_THRESHOLD_MS, keeping
+    SLOW_QUERY_SAMPLE_RATE of them. Parameters are redacted unless
+    SLOW_QUERY_LOG_PARAMETERS is set."""
+    if settings.SLOW_QUERY_SAMPLE_RATE <= 0:
+        return
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        context.slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters,
+                             context, executemany):
+        elapsed = time.perf_counter() - context.slow_query_started
+        if elapsed < threshold:
+            return
+        if random.random() >= settings.SLOW_QUERY_SAMPLE_RATE:
+            return
+        logger.warning(
+            "slow query %.1f ms rows=%s route=%s statement=%s parameters=%s",
+            elapsed * 1000,
+            _get_row_count(cursor),
+            get_current_route(),
+            statement,
+            parameters if settings.SLOW_QUERY_LOG_PARAMETERS else REDACTED,
+        )
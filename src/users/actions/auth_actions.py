@@ -2,14 +2,26 @@ from typing import Union
 
 from fastapi import Depends, HTTPException, Request
 from jose import JWTError
-from jwt import decode
+from jwt import PyJWTError, decode
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from src import settings
 from src.database import get_db
+from src.responses import dump_fields
+from src.users.caches import (
+    get_auth_user,
+    cache_auth_user,
+    get_token_version,
+    cache_token_version,
+    REVOKED_TOKEN_VERSION,
+    get_verified_token,
+    cache_verified_token,
+)
 from src.users.dals import UserDAL
+from src.users.schemas.auth_schemas import TokenClaimsModel
 from src.users.schemas.users_schemas import CurrentUserResponseModel
 from src.security import Hasher
 from src.users.models import User
@@ -24,22 +36,32 @@ ADMIN_REQUIRED_TEXT: str = "Доступ разрешен только адми
 
 
 async def _get_user_by_email_for_auth(
-        email: str, session: AsyncSession) -> Union[User, None]:
+        email: str,
+        session: AsyncSession,
+        use_cache: bool = True,
+) -> Union[User, None]:
+    if use_cache:
+        user = get_auth_user(email)
+        if user is not None:
+            return user
     async with session.begin():
         user_dal = UserDAL(session)
         user = await user_dal.get_user_by_email(email)
-        return user
+    if user is not None:
+        cache_auth_user(user)
+    return user
 
 
 async def authenticate_user(
     login: str, password: str, session: AsyncSession
 ) -> Union[User, None]:
     user = await _get_user_by_email_for_auth(
-        email=login, session=session
+        email=login, session=session, use_cache=False,
     )
     if user is None:
         return
-    if not Hasher.verify_password(password, user.hashed_password):
+    if not await Hasher.verify_password_async(
+            password, user.hashed_password):
         return
     return user
 
@@ -51,26 +73,67 @@ async def get_token_from_cookie(request: Request):
     return token
 
 
-async def get_current_user_from_token(
+def _get_token_data(user: User) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "adm": user.is_admin,
+        "ver": user.token_version,
+    }
+
+
+async def _get_current_token_version(
+        user_id: int, session: AsyncSession) -> int:
+    version = get_token_version(user_id)
+    if version is not None:
+        return version
+    async with session.begin():
+        user_dal = UserDAL(session)
+        version = await user_dal.get_token_version(user_id)
+    cache_token_version(user_id, version)
+    return REVOKED_TOKEN_VERSION if version is None else version
+
+
+async def get_token_claims(
         token: str = Depends(get_token_from_cookie),
         session: AsyncSession = Depends(get_db)
-):
+) -> TokenClaimsModel:
+    """Verified claims of a token whose version is still current,
+    a version bump on the user revokes every token issued before it"""
     if not token:
         raise CREDENTIALS_EXCEPTION
 
     try:
-        payload = decode(
-            token, settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
+        payload = get_verified_token(token)
+        if payload is None:
+            payload = decode(
+                token, settings.SECRET_KEY,
+                algorithms=[settings.ALGORITHM],
+            )
+            cache_verified_token(token, payload)
+        claims = TokenClaimsModel(
+            user_id=payload.get("uid"),
+            email=payload.get("sub"),
+            is_admin=payload.get("adm"),
+            token_version=payload.get("ver"),
         )
-        email: str = payload.get("sub")
-        if email is None:
-            raise CREDENTIALS_EXCEPTION
-    except JWTError:
+    except (JWTError, PyJWTError, ValidationError):
         raise CREDENTIALS_EXCEPTION
 
+    current_version = await _get_current_token_version(
+        claims.user_id, session,
+    )
+    if current_version != claims.token_version:
+        raise CREDENTIALS_EXCEPTION
+    return claims
+
+
+async def get_current_user_from_token(
+        claims: TokenClaimsModel = Depends(get_token_claims),
+        session: AsyncSession = Depends(get_db)
+):
     user = await _get_user_by_email_for_auth(
-        email=email, session=session
+        email=claims.email, session=session
     )
     if user is None:
         raise CREDENTIALS_EXCEPTION
@@ -78,27 +141,20 @@ async def get_current_user_from_token(
 
 
 async def admin_required(
-        user: User = Depends(get_current_user_from_token)):
-    if not user.is_admin:
+        claims: TokenClaimsModel = Depends(get_token_claims)
+) -> TokenClaimsModel:
+    if not claims.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=ADMIN_REQUIRED_TEXT,
         )
-    return user
+    return claims
 
 
-def _create_auth_response(user: User, access_token: str) -> JSONResponse:
-    response = JSONResponse(
+def _create_auth_response(user: User, access_token: str) -> ORJSONResponse:
+    response = ORJSONResponse(
         status_code=status.HTTP_200_OK,
-        content=CurrentUserResponseModel(
-            first_name=user.first_name,
-            last_name=user.last_name,
-            other_name=user.other_name,
-            email=user.email,
-            phone=user.phone,
-            birthday=user.birthday,
-            is_admin=user.is_admin,
-        ).dict(),
+        content=dump_fields(user, CurrentUserResponseModel),
     )
     response.set_cookie(
         key=AUTHORIZATION,
@@ -1,85 +1,111 @@
-from typing import List
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from src.users.actions.users_actions import _convert_users_to_list_elements
-from src.users.schemas.users_schemas import (UsersListElementModel,
-                                             PaginatedMetaDataModel,)
-from src.security import Hasher
-from src.users.dals import UserDAL, CityDAL
+from src import settings
+
+from src.users.actions.users_actions import (
+    EMAIL_EXEPTION_MESSAGE,
+    PHONE_EXEPTION_MESSAGE,
+    USER_NOT_FOUND_EXEPTION,
+    _get_conflict_exception,
+    _update_user_returning,
+    _convert_users_to_list_elements,
+    _get_users_page,
+    _get_next_cursor,
+    _create_pagination_meta,
+    _get_users_list_etag,
+    _get_user_etag,
+)
+from src.etags import etag_matches, not_modified
+from src.responses import dump_fields, dump_many
+from src.users.caches import get_city_hints, cache_city_hints
+from src.security import Hasher, PasswordHasherUnavailable
+from src.users.dals import (
+    UserDAL,
+    CityDAL,
+    USER_EXPORT_COLUMNS,
+    PRIVATE_USER_LIST_COLUMNS,
+)
 from src.users.schemas.private_schemas import (
     PrivateCreateUserModel,
     PrivateDetailUserResponseModel,
     PrivateUpdateUserModel,
-    PrivateUsersListResponseModel,
     CitiesHintModel,
-    PrivateUsersListMetaDataModel,
-    PrivateUsersListHintMetaModel,
+    PrivateBulkCreateUserResultModel,
+    PrivateBulkCreateUsersResponseModel,
 )
 
 
-EMAIL_EXEPTION_MESSAGE: str = "Почта уже используется"
-USER_NOT_FOUND_EXEPTION_MESSAGE: str = "Пользователь не найден"
-PHONE_EXEPTION_MESSAGE: str = "Телефон уже используется"
 AUTHORIZATION: str = "Authorization"
-USER_NOT_FOUND_EXEPTION = HTTPException(
-    status_code=status.HTTP_404_NOT_FOUND,
-    detail=USER_NOT_FOUND_EXEPTION_MESSAGE,
+INVALID_JSON_EXEPTION_MESSAGE: str = "Некорректный JSON"
+CONFLICT_EXEPTION_MESSAGE: str = "Почта или телефон уже используется"
+HASHER_UNAVAILABLE_EXEPTION_MESSAGE: str = "Сервис перегружен, попробуйте позже"
+BULK_BODY_EXEPTION = HTTPException(
+    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    detail="Ожидается JSON массив или NDJSON",
 )
-PHONE_EXEPTION = HTTPException(
-    status_code=status.HTTP_400_BAD_REQUEST,
-    detail=PHONE_EXEPTION_MESSAGE,
-)
-EMAIL_EXEPTION = HTTPException(
-    status_code=status.HTTP_400_BAD_REQUEST,
-    detail=EMAIL_EXEPTION_MESSAGE,
+NDJSON_CONTENT_TYPES: Tuple[str, ...] = (
+    "application/x-ndjson", "application/ndjson", "application/jsonlines",
 )
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
 
 
 async def _create_new_user(
         body: PrivateCreateUserModel, session: AsyncSession
 ) -> PrivateDetailUserResponseModel:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        email_user = await user_dal.get_user_by_email(
-            email=body.email
-        )
-        phone_user = await user_dal.get_user_by_phone(
-            phone=body.phone
-        )
-        if email_user:
-            raise EMAIL_EXEPTION
-        if phone_user:
-            raise PHONE_EXEPTION
-        user = await user_dal.create_user(
-            first_name=body.first_name,
-            last_name=body.last_name,
-            other_name=body.other_name,
-            email=body.email,
-            phone=body.phone,
-            birthday=body.birthday,
-            city=body.city,
-            additional_info=body.additional_info,
-            is_admin=body.is_admin,
-            hashed_password=Hasher.get_password_hash(
-                body.password
-            ),
-        )
-        return PrivateDetailUserResponseModel.from_orm(user)
+    """Uniqueness is enforced by the email and phone constraints
+    within the INSERT itself, not by looking the values up first"""
+    hashed_password = await Hasher.get_password_hash_async(body.password)
+    try:
+        async with session.begin():
+            user_dal = UserDAL(session)
+            user = await user_dal.create_user(
+                first_name=body.first_name,
+                last_name=body.last_name,
+                other_name=body.other_name,
+                email=body.email,
+                phone=body.phone,
+                birthday=body.birthday,
+                city=body.city,
+                additional_info=body.additional_info,
+                is_admin=body.is_admin,
+                hashed_password=hashed_password,
+            )
+            return PrivateDetailUserResponseModel.from_orm(user)
+    except IntegrityError as exc:
+        raise _get_conflict_exception(exc)
 
 
 async def _update_user_by_id(
         user_id: int,
         body: PrivateUpdateUserModel,
         session: AsyncSession,
-) -> PrivateDetailUserResponseModel:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        update_data = body.dict(exclude_unset=True)
-        user = await user_dal.update_user(user_id, update_data)
-        return PrivateDetailUserResponseModel.from_orm(user)
+        if_match: Optional[str] = None,
+) -> ORJSONResponse:
+    update_data = body.dict(exclude_unset=True, exclude={"id"})
+    if "password" in update_data:
+        update_data["hashed_password"] = (
+            await Hasher.get_password_hash_async(update_data.pop("password"))
+        )
+    return await _update_user_returning(
+        user_id=user_id,
+        update_data=update_data,
+        model=PrivateDetailUserResponseModel,
+        session=session,
+        if_match=if_match,
+    )
 
 
 async def _delete_user_by_id(
@@ -91,59 +117,259 @@ async def _delete_user_by_id(
 
 
 async def _get_user_by_id_private(
-        user_id: int, session: AsyncSession
-) -> PrivateDetailUserResponseModel:
+        user_id: int,
+        session: AsyncSession,
+        if_none_match: Optional[str] = None,
+) -> Response:
     async with session.begin():
         user_dal = UserDAL(session)
+        if if_none_match:
+            version = await user_dal.get_user_version(user_id)
+            if version is None:
+                raise USER_NOT_FOUND_EXEPTION
+            etag = _get_user_etag(user_id, version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
         user = await user_dal.get_user_by_id(user_id)
         if not user:
             raise USER_NOT_FOUND_EXEPTION
-        return PrivateDetailUserResponseModel.from_orm(user)
+        return ORJSONResponse(
+            content=dump_fields(user, PrivateDetailUserResponseModel),
+            headers={"ETag": _get_user_etag(user.id, user.version)},
+        )
 
 
 async def _get_cities(
-        session: AsyncSession) -> List[CitiesHintModel]:
-    city_dal = CityDAL(session)
-    cities = await city_dal.get_cities()
-    cities_hints = [
-        CitiesHintModel(id=city.id, name=city.name) for city in cities
-    ]
-    return cities_hints
+        city_ids: Set[int], session: AsyncSession) -> List[Dict]:
+    """Hints of just the cities referenced on the page, so the block
+    grows with the page size instead of the city table"""
+    cities_hints = get_city_hints(city_ids)
+    missing_ids = city_ids.difference(cities_hints)
+    if missing_ids:
+        city_dal = CityDAL(session)
+        cities = dump_many(
+            await city_dal.get_cities_by_ids(missing_ids), CitiesHintModel,
+        )
+        cache_city_hints(cities)
+        cities_hints.update((city["id"], city) for city in cities)
+    return [cities_hints[city_id] for city_id in sorted(cities_hints)]
 
 
 async def _create_private_users_list_response(
-        users_list_elements: List[UsersListElementModel],
-        cities_hints: List[CitiesHintModel],
+        users_list_elements: List[Dict],
+        cities_hints: List[Dict],
         page: int,
         size: int,
         total: int,
-) -> PrivateUsersListResponseModel:
-    return PrivateUsersListResponseModel(
-        data=users_list_elements,
-        meta=PrivateUsersListMetaDataModel(
-            pagination=PaginatedMetaDataModel(
-                total=total,
-                page=page,
-                size=size,
-            ),
-            hint=PrivateUsersListHintMetaModel(
-                city=cities_hints
-            )
-        )
-    )
+        next_cursor: Optional[str] = None,
+) -> ORJSONResponse:
+    """Same body as PrivateUsersListResponseModel"""
+    return ORJSONResponse(content={
+        "data": users_list_elements,
+        "meta": {
+            "pagination": _create_pagination_meta(
+                page, size, total, next_cursor,
+            ).dict(),
+            "hint": {"city": cities_hints},
+        },
+    })
 
 
 async def _get_users_private(
-        page: int, size: int, session: AsyncSession
-) -> PrivateUsersListResponseModel:
+        page: int,
+        size: int,
+        session: AsyncSession,
+        cursor: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+) -> Response:
     async with session.begin():
         user_dal = UserDAL(session)
-        total = await user_dal.get_total_users_count()
-        users = await user_dal.get_users(page=page, size=size)
+        users, total = await _get_users_page(
+            user_dal, page, size, cursor, columns=PRIVATE_USER_LIST_COLUMNS,
+        )
+        etag = _get_users_list_etag(users, total)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
 
         users_list_elements = await _convert_users_to_list_elements(users)
-        cities_hints = await _get_cities(session)
+        cities_hints = await _get_cities(
+            {user.city for user in users if user.city is not None}, session,
+        )
         response = await _create_private_users_list_response(
-            users_list_elements, cities_hints, page, size, total
+            users_list_elements, cities_hints, page, size, total,
+            _get_next_cursor(users, size),
         )
+        response.headers["ETag"] = etag
         return response
+
+
+async def _iter_bulk_rows(request: Request) -> AsyncIterator[Any]:
+    """NDJSON is consumed line by line as it arrives, a JSON array
+    has to be read whole"""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(NDJSON_CONTENT_TYPES):
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise BULK_BODY_EXEPTION
+        if not isinstance(rows, list):
+            raise BULK_BODY_EXEPTION
+        for row in rows:
+            yield row
+        return
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def _parse_bulk_row(row: Any) -> PrivateCreateUserModel:
+    if isinstance(row, bytes):
+        row = json.loads(row)
+    return PrivateCreateUserModel.parse_obj(row)
+
+
+def _bulk_error(index: int, message: str) -> PrivateBulkCreateUserResultModel:
+    return PrivateBulkCreateUserResultModel(index=index, error=message)
+
+
+async def _create_users_chunk(
+        chunk: List[Tuple[int, Any]],
+        seen_emails: Set[str],
+        seen_phones: Set[str],
+        session: AsyncSession,
+) -> List[PrivateBulkCreateUserResultModel]:
+    results: List[PrivateBulkCreateUserResultModel] = []
+    bodies: List[Tuple[int, PrivateCreateUserModel]] = []
+    for index, row in chunk:
+        try:
+            bodies.append((index, _parse_bulk_row(row)))
+        except ValidationError as exc:
+            results.append(_bulk_error(index, exc.errors()[0]["msg"]))
+        except ValueError:
+            results.append(_bulk_error(index, INVALID_JSON_EXEPTION_MESSAGE))
+
+    async with session.begin():
+        user_dal = UserDAL(session)
+        existing_emails = await user_dal.get_existing_emails(
+            [body.email for _, body in bodies]
+        )
+        existing_phones = await user_dal.get_existing_phones(
+            [body.phone for _, body in bodies if body.phone]
+        )
+
+    new_users: List[Tuple[int, PrivateCreateUserModel]] = []
+    for index, body in bodies:
+        if body.email in existing_emails or body.email in seen_emails:
+            results.append(_bulk_error(index, EMAIL_EXEPTION_MESSAGE))
+        elif body.phone and (
+                body.phone in existing_phones or body.phone in seen_phones):
+            results.append(_bulk_error(index, PHONE_EXEPTION_MESSAGE))
+        else:
+            seen_emails.add(body.email)
+            if body.phone:
+                seen_phones.add(body.phone)
+            new_users.append((index, body))
+
+    try:
+        hashed_passwords = await Hasher.get_password_hashes_async(
+            [body.password for _, body in new_users]
+        )
+    except PasswordHasherUnavailable:
+        return results + [
+            _bulk_error(index, HASHER_UNAVAILABLE_EXEPTION_MESSAGE)
+            for index, _ in new_users
+        ]
+
+    async with session.begin():
+        user_dal = UserDAL(session)
+        created = await user_dal.create_users([
+            {
+                **body.dict(exclude={"password"}),
+                "hashed_password": hashed_password,
+            }
+            for (_, body), hashed_password in zip(new_users, hashed_passwords)
+        ])
+    for index, body in new_users:
+        if body.email in created:
+            results.append(PrivateBulkCreateUserResultModel(
+                index=index, id=created[body.email], email=body.email,
+            ))
+        else:
+            results.append(_bulk_error(index, CONFLICT_EXEPTION_MESSAGE))
+    return results
+
+
+async def _bulk_create_users(
+        request: Request, session: AsyncSession,
+) -> PrivateBulkCreateUsersResponseModel:
+    results: List[PrivateBulkCreateUserResultModel] = []
+    seen_emails: Set[str] = set()
+    seen_phones: Set[str] = set()
+    chunk: List[Tuple[int, Any]] = []
+    index = 0
+    async for row in _iter_bulk_rows(request):
+        chunk.append((index, row))
+        index += 1
+        if len(chunk) >= settings.USERS_BULK_CHUNK_SIZE:
+            results += await _create_users_chunk(
+                chunk, seen_emails, seen_phones, session,
+            )
+            chunk = []
+    if chunk:
+        results += await _create_users_chunk(
+            chunk, seen_emails, seen_phones, session,
+        )
+
+    results.sort(key=lambda result: result.index)
+    failed = sum(1 for result in results if result.error is not None)
+    return PrivateBulkCreateUsersResponseModel(
+        created=len(results) - failed,
+        failed=failed,
+        results=results,
+    )
+
+
+def _serialize_export_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(row._asdict(), default=str, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _serialize_export_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def _iter_users_export(
+        export_format: str, session: AsyncSession) -> AsyncIterator[str]:
+    if export_format == "csv":
+        serialize = _serialize_export_csv
+        yield serialize([[column.key for column in USER_EXPORT_COLUMNS]])
+    else:
+        serialize = _serialize_export_ndjson
+    async with session.begin():
+        user_dal = UserDAL(session)
+        async for rows in user_dal.stream_users(
+                settings.USERS_EXPORT_CHUNK_SIZE):
+            yield serialize(rows)
+
+
+async def _export_users(
+        export_format: str, session: AsyncSession) -> StreamingResponse:
+    return StreamingResponse(
+        _iter_users_export(export_format, session),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition":
+                f"attachment; filename=users.{export_format}",
+        },
+    )
@@ -1,13 +1,37 @@
-from typing import List
+import base64
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Type
 
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
 
-from src.users.dals import UserDAL
+from src import settings
+from src.database import used_replica
+from src.etags import (
+    etag_matches,
+    make_digest_etag,
+    make_etag,
+    not_modified,
+    parse_etags,
+)
+from src.responses import dump_fields, dump_many
+from src.users.caches import users_list_cache
+from src.users.counters import users_count
+from src.users.dals import (
+    UserDAL,
+    USER_EMAIL_CONSTRAINT,
+    USER_PHONE_CONSTRAINT,
+    USER_LIST_COLUMNS,
+    get_violated_constraint,
+)
 from src.users.models import User
 from src.users.schemas.users_schemas import (
-    UsersListResponseModel,
     UsersListElementModel,
-    UsersListMetaDataModel,
     PaginatedMetaDataModel,
     UpdateUserModel,
     UpdateUserResponseModel,
@@ -15,64 +39,270 @@ from src.users.schemas.users_schemas import (
 
 
 USER_NOT_FOUND_EXEPTION_MESSAGE: str = "Пользователь не найден"
+EMAIL_EXEPTION_MESSAGE: str = "Почта уже используется"
+PHONE_EXEPTION_MESSAGE: str = "Телефон уже используется"
+USER_NOT_FOUND_EXEPTION = HTTPException(
+    status_code=status.HTTP_404_NOT_FOUND,
+    detail=USER_NOT_FOUND_EXEPTION_MESSAGE,
+)
+PHONE_EXEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail=PHONE_EXEPTION_MESSAGE,
+)
+EMAIL_EXEPTION = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail=EMAIL_EXEPTION_MESSAGE,
+)
+CONSTRAINT_EXEPTIONS: Dict[str, HTTPException] = {
+    USER_EMAIL_CONSTRAINT: EMAIL_EXEPTION,
+    USER_PHONE_CONSTRAINT: PHONE_EXEPTION,
+}
+INVALID_CURSOR_EXEPTION = HTTPException(
+    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    detail="Некорректный курсор",
+)
+CURSOR_PREFIX: str = "id:"
+CURSOR_ID_REGEX = re.compile(r"[0-9]{1,10}")
+MAX_USER_ID: int = 2 ** 31 - 1  # user.id is int4
+CACHED_ETAG_SEPARATOR: bytes = b"\n"
+PRECONDITION_FAILED_EXEPTION = HTTPException(
+    status_code=status.HTTP_412_PRECONDITION_FAILED,
+    detail="Пользователь был изменен, получите его заново",
+)
 
 
-async def _convert_users_to_list_elements(
-        users: List[User]) -> List[UsersListElementModel]:
-    return [
-        UsersListElementModel(
-            id=user.id,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            email=user.email,
-        )
-        for user in users
-    ]
+def _encode_cursor(user_id: int) -> str:
+    raw = f"{CURSOR_PREFIX}{user_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
-async def _create_users_list_response(
-        users_list_elements: List[UsersListElementModel],
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded).decode()
+    except ValueError:
+        # binascii.Error, UnicodeDecodeError and non-ASCII input
+        raise INVALID_CURSOR_EXEPTION
+    if not raw.startswith(CURSOR_PREFIX):
+        raise INVALID_CURSOR_EXEPTION
+    user_id = raw[len(CURSOR_PREFIX):]
+    if not CURSOR_ID_REGEX.fullmatch(user_id):
+        raise INVALID_CURSOR_EXEPTION
+    user_id = int(user_id)
+    if user_id > MAX_USER_ID:
+        raise INVALID_CURSOR_EXEPTION
+    return user_id
+
+
+def _get_next_cursor(users: List[Row], size: int) -> Optional[str]:
+    if len(users) < size:
+        return None
+    return _encode_cursor(users[-1].id)
+
+
+def _create_pagination_meta(
         page: int,
         size: int,
         total: int,
-) -> UsersListResponseModel:
-    return UsersListResponseModel(
-        data=users_list_elements,
-        meta=UsersListMetaDataModel(
-            pagination=PaginatedMetaDataModel(
-                total=total,
-                page=page,
-                size=size,
-            )
+        next_cursor: Optional[str],
+) -> PaginatedMetaDataModel:
+    return PaginatedMetaDataModel(
+        total=total,
+        page=page,
+        size=size,
+        next_cursor=next_cursor,
+        total_exact=users_count.is_exact,
+        total_strategy=users_count.name,
+    )
+
+
+async def _get_users_page(
+        user_dal: UserDAL,
+        page: int,
+        size: int,
+        cursor: Optional[str],
+        columns: Sequence = USER_LIST_COLUMNS,
+) -> Tuple[List[Row], int]:
+    """Keyset pagination when a cursor is given, offset otherwise.
+
+    An exact offset page fetches rows and total in a single query.
+    """
+    if cursor is None and users_count.is_exact:
+        users, total = await user_dal.get_users_with_total(
+            page=page, size=size, columns=columns,
+        )
+        if total is None:
+            total = await users_count.get_total(user_dal)
+        return users, total
+
+    if cursor is None:
+        users = await user_dal.get_users(
+            page=page, size=size, columns=columns,
+        )
+    else:
+        users = await user_dal.get_users_after(
+            after_id=_decode_cursor(cursor), size=size, columns=columns,
         )
+    total = await users_count.get_total(user_dal)
+    return users, total
+
+
+def _get_users_list_etag(users: List[Row], total: int) -> str:
+    return make_digest_etag(
+        [(user.id, user.version) for user in users], total,
     )
 
 
+def _get_user_etag(user_id: int, version: int) -> str:
+    return make_etag(f"{user_id}-{version}")
+
+
+def _get_expected_version(
+        if_match: Optional[str], user_id: int) -> Optional[int]:
+    """Version from If-Match, None for an unconditional update.
+
+    Our ETags are weak, they are accepted here as well since the
+    version is exactly what the precondition is about.
+    """
+    tags = parse_etags(if_match)
+    if not tags or "*" in tags:
+        return None
+    for tag in tags:
+        tag_user_id, _, version = tag.partition("-")
+        if tag_user_id == str(user_id) and version.isdigit():
+            return int(version)
+    raise PRECONDITION_FAILED_EXEPTION
+
+
+async def _convert_users_to_list_elements(
+        users: List[Row]) -> List[Dict]:
+    return dump_many(users, UsersListElementModel)
+
+
+async def _create_users_list_response(
+        users_list_elements: List[Dict],
+        page: int,
+        size: int,
+        total: int,
+        next_cursor: Optional[str] = None,
+) -> ORJSONResponse:
+    """Same body as UsersListResponseModel, serialised without
+    re-validating rows that come straight from the database"""
+    return ORJSONResponse(content={
+        "data": users_list_elements,
+        "meta": {
+            "pagination": _create_pagination_meta(
+                page, size, total, next_cursor,
+            ).dict(),
+        },
+    })
+
+
 async def _get_users(
-        page: int, size: int, session: AsyncSession
-) -> UsersListResponseModel:
+        page: int,
+        size: int,
+        session: AsyncSession,
+        cursor: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+) -> Response:
+    cache_key = await users_list_cache.get_key(page, size, cursor or "")
+    cached = await users_list_cache.get(cache_key)
+    if cached is not None:
+        return _get_cached_users_list_response(cached, if_none_match)
+
     async with session.begin():
         user_dal = UserDAL(session)
-        total = await user_dal.get_total_users_count()
-        users = await user_dal.get_users(page=page, size=size)
+        users, total = await _get_users_page(user_dal, page, size, cursor)
+        etag = _get_users_list_etag(users, total)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
 
         users_list = await _convert_users_to_list_elements(users)
         response = await _create_users_list_response(
-            users_list, page, size, total)
-        return response
+            users_list, page, size, total, _get_next_cursor(users, size))
+        response.headers["ETag"] = etag
+    # a write may have bumped the generation before the replica got it,
+    # replica pages are only kept for a moment
+    await users_list_cache.set(
+        cache_key, etag.encode() + CACHED_ETAG_SEPARATOR + response.body,
+        ttl=(
+            settings.USERS_LIST_CACHE_REPLICA_TTL_SECONDS
+            if used_replica(session) else None
+        ),
+    )
+    return response
+
+
+def _get_cached_users_list_response(
+        cached: bytes, if_none_match: Optional[str]) -> Response:
+    etag, _, body = cached.partition(CACHED_ETAG_SEPARATOR)
+    etag = etag.decode()
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type=ORJSONResponse.media_type,
+        headers={"ETag": etag},
+    )
+
+
+def _get_conflict_exception(exc: IntegrityError) -> Exception:
+    return CONSTRAINT_EXEPTIONS.get(get_violated_constraint(exc), exc)
+
+
+def _get_user_columns(model: Type[BaseModel]) -> Tuple:
+    return tuple(getattr(User, name) for name in model.__fields__)
+
+
+async def _update_user_returning(
+        user_id: int,
+        update_data: Dict,
+        model: Type[BaseModel],
+        session: AsyncSession,
+        if_match: Optional[str] = None,
+) -> ORJSONResponse:
+    """One UPDATE ... RETURNING the response columns, email and phone
+    conflicts come back from the same statement as unique violations.
+
+    The If-Match version is part of the UPDATE condition, so a concurrent
+    change between reading and writing can not be overwritten.
+    """
+    expected_version = _get_expected_version(if_match, user_id)
+    try:
+        async with session.begin():
+            user_dal = UserDAL(session)
+            user = await user_dal.update_user(
+                user_id=user_id,
+                update_data=update_data,
+                columns=_get_user_columns(model) + (User.version,),
+                expected_version=expected_version,
+            )
+            if user is None and expected_version is not None:
+                version = await user_dal.get_user_version(
+                    user_id, active_only=True,
+                )
+                if version is not None:
+                    raise PRECONDITION_FAILED_EXEPTION
+    except IntegrityError as exc:
+        raise _get_conflict_exception(exc)
+    if user is None:
+        raise USER_NOT_FOUND_EXEPTION
+    return ORJSONResponse(
+        content=dump_fields(user, model),
+        headers={"ETag": _get_user_etag(user_id, user.version)},
+    )
 
 
 async def _update_user(
         user_id: int,
         body: UpdateUserModel,
         session: AsyncSession,
-) -> UpdateUserResponseModel:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        update_data = body.dict(exclude_unset=True)
-        await user_dal.update_user(
-            user_id=user_id,
-            update_data=update_data,
-        )
-        user = await user_dal.get_user_by_id(user_id)
-        return UpdateUserResponseModel.from_orm(user)
+        if_match: Optional[str] = None,
+) -> ORJSONResponse:
+    return await _update_user_returning(
+        user_id=user_id,
+        update_data=body.dict(exclude_unset=True),
+        model=UpdateUserResponseModel,
+        session=session,
+        if_match=if_match,
+    )
@@ -0,0 +1,126 @@
+import hashlib
+import time
+from typing import Dict, Iterable, Optional
+
+from src import settings
+from src.cache import TTLCache
+from src.response_cache import ResponseCache
+from src.users.models import User
+
+
+auth_user_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_MAXSIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+# email each cached user is keyed by, so invalidation by id is a lookup
+auth_user_emails = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_MAXSIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+city_hints_cache = TTLCache(
+    maxsize=settings.CITY_HINTS_CACHE_MAXSIZE,
+    ttl=settings.CITY_HINTS_CACHE_TTL_SECONDS,
+)
+token_version_cache = TTLCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_MAXSIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
+REVOKED_TOKEN_VERSION: int = -1
+verified_token_cache = TTLCache(
+    maxsize=settings.VERIFIED_TOKEN_CACHE_MAXSIZE,
+    ttl=settings.VERIFIED_TOKEN_CACHE_TTL_SECONDS,
+)
+users_list_cache = ResponseCache(
+    namespace="users_list",
+    ttl=settings.USERS_LIST_CACHE_TTL_SECONDS,
+    maxsize=settings.USERS_LIST_CACHE_MAXSIZE,
+    redis_url=settings.RESPONSE_CACHE_REDIS_URL,
+)
+
+
+def get_auth_user(email: str) -> Optional[User]:
+    user = auth_user_cache.get(email)
+    if user is not None:
+        # keep the index entry as recently used as the user it points to
+        auth_user_emails.get(user.id)
+    return user
+
+
+def cache_auth_user(user: User) -> None:
+    """Keep a detached copy so the cached object never leaks a session"""
+    auth_user_cache.set(
+        user.email,
+        User(**{
+            column.name: getattr(user, column.name)
+            for column in User.__table__.columns
+        }),
+    )
+    auth_user_emails.set(user.id, user.email)
+
+
+def invalidate_auth_user(user_id: int) -> None:
+    email = auth_user_emails.get(user_id)
+    if email is not None:
+        auth_user_emails.pop(user_id)
+        auth_user_cache.pop(email)
+
+
+def get_token_version(user_id: int) -> Optional[int]:
+    return token_version_cache.get(user_id)
+
+
+def cache_token_version(user_id: int, version: Optional[int]) -> None:
+    """None means the user is gone or deactivated, which is cached
+    too so that revoked tokens do not reach the database either"""
+    token_version_cache.set(
+        user_id, REVOKED_TOKEN_VERSION if version is None else version,
+    )
+
+
+def invalidate_token_version(user_id: int) -> None:
+    token_version_cache.pop(user_id)
+
+
+def _get_token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def get_verified_token(token: str) -> Optional[Dict]:
+    return verified_token_cache.get(_get_token_digest(token))
+
+
+def cache_verified_token(token: str, payload: Dict) -> None:
+    """Kept until the token's own exp, after that it has to be
+    decoded and rejected again"""
+    verified_token_cache.set(
+        _get_token_digest(token), payload, ttl=payload["exp"] - time.time(),
+    )
+
+
+def get_city_hints(city_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Cached hints by city id, ids missing from the cache are left out"""
+    hints = {}
+    for city_id in city_ids:
+        hint = city_hints_cache.get(city_id)
+        if hint is not None:
+            hints[city_id] = hint
+    return hints
+
+
+def cache_city_hints(hints: Iterable[Dict]) -> None:
+    for hint in hints:
+        city_hints_cache.set(hint["id"], hint)
+
+
+def invalidate_city_hints() -> None:
+    city_hints_cache.clear()
+
+
+def get_caches_stats() -> Dict[str, Dict]:
+    return {
+        "auth_user": auth_user_cache.stats(),
+        "city_hints": city_hints_cache.stats(),
+        "token_version": token_version_cache.stats(),
+        "verified_token": verified_token_cache.stats(),
+        "users_list": users_list_cache.stats(),
+    }
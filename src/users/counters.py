@@ -0,0 +1,93 @@
+import time
+from typing import Dict, Optional, Type
+
+from src import settings
+
+
+class ExactUsersCount:
+    """count(*) over active users on every request"""
+
+    name: str = "exact"
+    is_exact: bool = True
+
+    async def get_total(self, user_dal) -> int:
+        return await user_dal.get_total_users_count()
+
+    def on_created(self, count: int = 1) -> None:
+        pass
+
+    def on_deleted(self, count: int = 1) -> None:
+        pass
+
+
+class CachedUsersCount(ExactUsersCount):
+    """Exact count reused for USERS_COUNT_CACHE_TTL_SECONDS"""
+
+    name: str = "cached"
+    is_exact: bool = False
+
+    def __init__(self, ttl: float = settings.USERS_COUNT_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._total: Optional[int] = None
+        self._expires_at: float = 0.0
+
+    async def get_total(self, user_dal) -> int:
+        if self._total is None or self._expires_at <= time.monotonic():
+            self._total = await user_dal.get_total_users_count()
+            self._expires_at = time.monotonic() + self.ttl
+        return self._total
+
+
+class CounterUsersCount(CachedUsersCount):
+    """Cached count adjusted in place by this worker's creates and deletes.
+
+    Writes made by other workers show up after the next resync.
+    """
+
+    name: str = "counter"
+
+    def on_created(self, count: int = 1) -> None:
+        if self._total is not None:
+            self._total += count
+
+    def on_deleted(self, count: int = 1) -> None:
+        if self._total is not None:
+            self._total = max(0, self._total - count)
+
+
+class EstimatedUsersCount(ExactUsersCount):
+    """Planner estimate of active users from pg_class.reltuples"""
+
+    name: str = "estimate"
+    is_exact: bool = False
+
+    async def get_total(self, user_dal) -> int:
+        total = await user_dal.get_estimated_users_count()
+        if total < 0:
+            # table has never been analyzed yet
+            return await user_dal.get_total_users_count()
+        return total
+
+
+USERS_COUNT_STRATEGIES: Dict[str, Type[ExactUsersCount]] = {
+    strategy.name: strategy
+    for strategy in (
+        ExactUsersCount,
+        CachedUsersCount,
+        CounterUsersCount,
+        EstimatedUsersCount,
+    )
+}
+
+
+def get_users_count_strategy(name: str) -> ExactUsersCount:
+    try:
+        return USERS_COUNT_STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown USERS_COUNT_STRATEGY {name!r}, "
+            f"expected one of {sorted(USERS_COUNT_STRATEGIES)}"
+        )
+
+
+users_count = get_users_count_strategy(settings.USERS_COUNT_STRATEGY)
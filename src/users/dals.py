@@ -1,12 +1,86 @@
 from datetime import date
-from typing import Union, List, Optional, Dict
+from typing import (
+    Union, List, Optional, Dict, Tuple, Set, AsyncIterator, Sequence,
+    Iterable,
+)
 
-from sqlalchemy import update, select, and_, func
+from sqlalchemy import update, select, and_, or_, case, func, text
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database import run_after_commit
+from src.users.caches import (
+    invalidate_auth_user,
+    invalidate_city_hints,
+    invalidate_token_version,
+    users_list_cache,
+)
+from src.users.counters import users_count
 from src.users.models import User, City
 
 
+USER_EMAIL_CONSTRAINT: str = "user_email_key"
+USER_PHONE_CONSTRAINT: str = "user_phone_key"
+TOKEN_REVOKING_FIELDS = frozenset({"email", "is_admin"})
+# asyncpg caps a statement at 32767 bind parameters, below the 65535
+# the PostgreSQL protocol itself allows
+MAX_BIND_PARAMS: int = 32767
+USERS_PER_INSERT: int = MAX_BIND_PARAMS // len(User.__table__.columns)
+USER_LIST_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.version,
+)
+PRIVATE_USER_LIST_COLUMNS = USER_LIST_COLUMNS + (User.city,)
+USER_EXPORT_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.other_name,
+    User.email,
+    User.phone,
+    User.birthday,
+    User.city,
+    User.additional_info,
+    User.is_admin,
+)
+
+
+def get_token_version_update(update_data: Dict):
+    """New token_version for an UPDATE, None when tokens stay valid.
+
+    A password change always revokes, email and is_admin only when the
+    new value differs from the stored one.
+    """
+    if "hashed_password" in update_data:
+        return User.token_version + 1
+    changed = [
+        getattr(User, field).is_distinct_from(update_data[field])
+        for field in sorted(TOKEN_REVOKING_FIELDS & update_data.keys())
+    ]
+    if not changed:
+        return None
+    return case(
+        (or_(*changed), User.token_version + 1),
+        else_=User.token_version,
+    )
+
+
+def get_violated_constraint(exc: IntegrityError) -> Optional[str]:
+    """Name of the constraint behind an IntegrityError, asyncpg keeps it
+    on the wrapped driver exception, psycopg2 on its diagnostics"""
+    cause = getattr(exc.orig, "__cause__", None)
+    constraint_name = getattr(cause, "constraint_name", None)
+    if constraint_name is None:
+        diag = getattr(exc.orig, "diag", None)
+        constraint_name = getattr(diag, "constraint_name", None)
+    return constraint_name
+
+
 class UserDAL:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
@@ -38,45 +112,172 @@ class UserDAL:
         )
         self.db_session.add(new_user)
         await self.db_session.flush()
+        run_after_commit(self.db_session, users_count.on_created)
+        run_after_commit(self.db_session, users_list_cache.invalidate)
         return new_user
 
+    async def create_users(self, users: List[Dict]) -> Dict[str, int]:
+        """Multi-row insert skipping rows that hit a unique constraint.
+
+        Returns ids of the inserted rows by email.
+        """
+        created: Dict[str, int] = {}
+        for start in range(0, len(users), USERS_PER_INSERT):
+            query = (
+                insert(User)
+                .values([
+                    {"is_active": True, **user}
+                    for user in users[start:start + USERS_PER_INSERT]
+                ])
+                .on_conflict_do_nothing()
+                .returning(User.id, User.email)
+            )
+            res = await self.db_session.execute(query)
+            created.update(
+                {email: user_id for user_id, email in res.fetchall()}
+            )
+        if created:
+            run_after_commit(
+                self.db_session, lambda: users_count.on_created(len(created)),
+            )
+            run_after_commit(self.db_session, users_list_cache.invalidate)
+        return created
+
+    def _invalidate_user_caches(self, user_id: int) -> None:
+        """Only once the write has committed, before that a concurrent
+        read could put the old row right back"""
+        run_after_commit(
+            self.db_session, lambda: invalidate_auth_user(user_id),
+        )
+        run_after_commit(
+            self.db_session, lambda: invalidate_token_version(user_id),
+        )
+        run_after_commit(self.db_session, users_list_cache.invalidate)
+
     async def delete_user(self, user_id: int) -> bool:
+        """Soft delete, False when the user is missing or already deleted"""
         query = (
             update(User)
-            .where(User.id == user_id)
-            .values(is_active=False)
+            .where(and_(User.id == user_id, User.is_active == True))
+            .values(
+                is_active=False,
+                token_version=User.token_version + 1,
+                version=User.version + 1,
+            )
             .returning(User.id)
         )
         res = await self.db_session.execute(query)
-
-        if res.rowcount == 1:
-            return True
-        return False
+        if res.rowcount != 1:
+            return False
+        self._invalidate_user_caches(user_id)
+        run_after_commit(self.db_session, users_count.on_deleted)
+        return True
 
     async def update_user(
-            self, user_id: int, update_data: Dict) -> Optional[User]:
+            self,
+            user_id: int,
+            update_data: Dict,
+            columns: Sequence = USER_EXPORT_COLUMNS,
+            expected_version: Optional[int] = None,
+    ) -> Optional[Row]:
+        """Update an active user and return the given columns of the
+        updated row in the same statement.
+
+        With expected_version the row is only touched while it still has
+        that version, otherwise nothing is returned.
+        """
+        condition = and_(User.id == user_id, User.is_active == True)
+        if expected_version is not None:
+            condition = and_(condition, User.version == expected_version)
+        if not update_data:
+            query = select(*columns).where(condition)
+        else:
+            token_version = get_token_version_update(update_data)
+            update_data = {**update_data, "version": User.version + 1}
+            if token_version is not None:
+                update_data["token_version"] = token_version
+            query = (
+                update(User)
+                .where(condition)
+                .values(**update_data)
+                .returning(*columns)
+            )
+        res = await self.db_session.execute(query)
+        if update_data:
+            self._invalidate_user_caches(user_id)
+        return res.fetchone()
+
+    async def get_users(
+            self,
+            page: int,
+            size: int,
+            columns: Sequence = USER_LIST_COLUMNS,
+    ) -> List[Row]:
+        """Active users page as lightweight rows of the given columns,
+        no ORM entities are built or tracked by the session"""
+        offset = (page - 1) * size
         query = (
-            update(User)
-            .where(and_(User.id == user_id, User.is_active == True))
-            .values(**update_data)
-            .returning(User)
+            select(*columns)
+            .where(User.is_active == True)
+            .order_by(User.id)
+            .offset(offset)
+            .limit(size)
         )
         res = await self.db_session.execute(query)
-        row = res.fetchone()
-        if row is not None:
-            return User(**row)
+        return res.fetchall()
 
-    async def get_users(self, page: int, size: int,) -> list[User]:
+    async def get_users_with_total(
+            self,
+            page: int,
+            size: int,
+            columns: Sequence = USER_LIST_COLUMNS,
+    ) -> Tuple[List[Row], Optional[int]]:
+        """Page rows and the active users total in one round trip.
+
+        The total comes from count(*) OVER () and is None when the page
+        is past the end, since there is no row to carry it.
+        """
         offset = (page - 1) * size
         query = (
-            select(User)
+            select(*columns, func.count().over().label("total"))
             .where(User.is_active == True)
+            .order_by(User.id)
             .offset(offset)
             .limit(size)
         )
         res = await self.db_session.execute(query)
-        users = res.fetchall()
-        return [user for user, in users]
+        rows = res.fetchall()
+        if not rows:
+            return [], None
+        return rows, rows[0].total
+
+    async def get_users_after(
+            self,
+            after_id: int,
+            size: int,
+            columns: Sequence = USER_LIST_COLUMNS,
+    ) -> List[Row]:
+        query = (
+            select(*columns)
+            .where(and_(User.id > after_id, User.is_active == True))
+            .order_by(User.id)
+            .limit(size)
+        )
+        res = await self.db_session.execute(query)
+        return res.fetchall()
+
+    async def stream_users(
+            self, chunk_size: int) -> AsyncIterator[Sequence[Row]]:
+        """Active users from a server-side cursor, chunk_size rows at a time"""
+        query = (
+            select(*USER_EXPORT_COLUMNS)
+            .where(User.is_active == True)
+            .order_by(User.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        res = await self.db_session.stream(query)
+        async for rows in res.partitions(chunk_size):
+            yield rows
 
     async def get_user_by_id(self, user_id: int) -> Union[User, None]:
         query = select(User).where(User.id == user_id)
@@ -94,6 +295,32 @@ class UserDAL:
         res = await self.db_session.execute(query)
         return res.scalar()
 
+    async def get_estimated_users_count(self) -> int:
+        """Planner estimate of active users, read from the partial index
+        on active ids. reltuples is -1 until the first ANALYZE."""
+        query = text(
+            "SELECT greatest(reltuples, 0)::bigint FROM pg_class "
+            "WHERE oid = 'ix_user_active_id'::regclass"
+        )
+        res = await self.db_session.execute(query)
+        return res.scalar()
+
+    async def get_user_version(
+            self, user_id: int, active_only: bool = False) -> Optional[int]:
+        query = select(User.version).where(User.id == user_id)
+        if active_only:
+            query = query.where(User.is_active == True)
+        res = await self.db_session.execute(query)
+        return res.scalar()
+
+    async def get_token_version(self, user_id: int) -> Optional[int]:
+        query = (
+            select(User.token_version)
+            .where(and_(User.id == user_id, User.is_active == True))
+        )
+        res = await self.db_session.execute(query)
+        return res.scalar()
+
     async def get_user_by_email(self, email: str) -> Union[User, None]:
         query = select(User).where(User.email == email)
         res = await self.db_session.execute(query)
@@ -102,6 +329,20 @@ class UserDAL:
             return user[0]
         return None
 
+    async def get_existing_emails(self, emails: List[str]) -> Set[str]:
+        if not emails:
+            return set()
+        query = select(User.email).where(User.email.in_(emails))
+        res = await self.db_session.execute(query)
+        return set(res.scalars().all())
+
+    async def get_existing_phones(self, phones: List[str]) -> Set[str]:
+        if not phones:
+            return set()
+        query = select(User.phone).where(User.phone.in_(phones))
+        res = await self.db_session.execute(query)
+        return set(res.scalars().all())
+
     async def get_user_by_phone(self, phone: str) -> Union[User, None]:
         query = (
             select(User)
@@ -128,10 +369,48 @@ class CityDAL:
         )
         self.db_session.add(new_city)
         await self.db_session.flush()
+        run_after_commit(self.db_session, invalidate_city_hints)
         return new_city
 
+    async def bulk_upsert(
+            self, names: List[str], batch_size: int = 1000,
+    ) -> Dict[str, int]:
+        """Insert missing cities and return ids of all given names"""
+        ids: Dict[str, int] = {}
+        unique_names = list(dict.fromkeys(names))
+        for start in range(0, len(unique_names), batch_size):
+            batch = unique_names[start:start + batch_size]
+            query = (
+                insert(City)
+                .values([{"name": name} for name in batch])
+                .on_conflict_do_nothing(index_elements=[City.name])
+                .returning(City.id, City.name)
+            )
+            res = await self.db_session.execute(query)
+            inserted = {name: city_id for city_id, name in res.fetchall()}
+            if inserted:
+                run_after_commit(self.db_session, invalidate_city_hints)
+            ids.update(inserted)
+
+            existing = [name for name in batch if name not in inserted]
+            if existing:
+                query = (
+                    select(City.id, City.name)
+                    .where(City.name.in_(existing))
+                )
+                res = await self.db_session.execute(query)
+                ids.update(
+                    {name: city_id for city_id, name in res.fetchall()}
+                )
+        return ids
+
     async def get_cities(self) -> List[City]:
         query = select(City)
         res = await self.db_session.execute(query)
         cities = res.fetchall()
         return [city for city, in cities]
+
+    async def get_cities_by_ids(self, city_ids: Iterable[int]) -> List[Row]:
+        query = select(City.id, City.name).where(City.id.in_(city_ids))
+        res = await self.db_session.execute(query)
+        return res.fetchall()
@@ -1,12 +1,17 @@
-from sqlalchemy import Column, String, Date, Integer, Boolean
+from sqlalchemy import Column, String, Date, Integer, Boolean, Index, text
 
 from src.database import Base
 
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # pages, cursors and counts of active users, email and phone
+        # lookups go through the unique constraints
+        Index("ix_user_active_id", "id", postgresql_where=text("is_active")),
+    )
 
-    id = Column(Integer, primary_key=True, index=True,)
+    id = Column(Integer, primary_key=True,)
     first_name = Column(String, nullable=False,)
     last_name = Column(String, nullable=False,)
     other_name = Column(String, nullable=True,)
@@ -18,10 +23,14 @@ class User(Base):
     is_admin = Column(Boolean, nullable=False,)
     is_active = Column(Boolean, nullable=False, default=True)
     hashed_password = Column(String, nullable=False,)
+    token_version = Column(
+        Integer, nullable=False, default=0, server_default="0",
+    )
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
 
 class City(Base):
     __tablename__ = "city"
 
-    id = Column(Integer, primary_key=True, index=True,)
+    id = Column(Integer, primary_key=True,)
     name = Column(String, nullable=False, unique=True,)
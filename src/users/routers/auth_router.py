@@ -13,6 +13,7 @@ from src.users.actions.auth_actions import (
     authenticate_user,
     get_current_user_from_token,
     _create_auth_response,
+    _get_token_data,
 )
 
 
@@ -38,7 +39,7 @@ async def login(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_get_token_data(user), expires_delta=access_token_expires
     )
     return _create_auth_response(user, access_token)
 
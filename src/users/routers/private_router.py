@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-from src.users.models import User
+from src.database import (
+    engine,
+    get_db,
+    get_read_db,
+    read_engine,
+    read_with_fallback,
+)
+from src.pool_stats import get_pool_stats, replica_pool_stats
+from src.users.caches import get_caches_stats
+from src.users.schemas.auth_schemas import TokenClaimsModel
 from src.users.actions.auth_actions import admin_required
 from src.users.actions.private_actions import (
     _get_users_private,
@@ -11,12 +21,15 @@ from src.users.actions.private_actions import (
     _get_user_by_id_private,
     _update_user_by_id,
     _delete_user_by_id,
+    _bulk_create_users,
+    _export_users,
 )
 from src.users.schemas.private_schemas import (
     PrivateUsersListResponseModel,
     PrivateDetailUserResponseModel,
     PrivateCreateUserModel,
     PrivateUpdateUserModel,
+    PrivateBulkCreateUsersResponseModel,
 )
 
 
@@ -31,12 +44,15 @@ private_router = APIRouter()
 async def get_users(
     page: int = Query(1, gt=0),
     size: int = Query(20, gt=0),
-    user: User = Depends(admin_required),
-    session: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    claims: TokenClaimsModel = Depends(admin_required),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    return await _get_users_private(
-        page=page, size=size, session=session,
-    )
+    return await read_with_fallback(session, lambda: _get_users_private(
+        page=page, size=size, session=session, cursor=cursor,
+        if_none_match=if_none_match,
+    ))
 
 
 @private_router.post(
@@ -46,12 +62,39 @@ async def get_users(
 )
 async def create_user(
     body: PrivateCreateUserModel,
-    user: User = Depends(admin_required),
+    claims: TokenClaimsModel = Depends(admin_required),
     session: AsyncSession = Depends(get_db),
 ):
     return await _create_new_user(body=body, session=session)
 
 
+@private_router.post(
+    "/users/bulk",
+    response_model=PrivateBulkCreateUsersResponseModel,
+    status_code=200,
+)
+async def bulk_create_users(
+    request: Request,
+    claims: TokenClaimsModel = Depends(admin_required),
+    session: AsyncSession = Depends(get_db),
+):
+    """JSON array or NDJSON stream of users to create"""
+    return await _bulk_create_users(request=request, session=session)
+
+
+@private_router.get("/users/export", status_code=200)
+async def export_users(
+    export_format: str = Query(
+        "ndjson", alias="format", regex="^(ndjson|csv)$",
+    ),
+    claims: TokenClaimsModel = Depends(admin_required),
+    session: AsyncSession = Depends(get_read_db),
+):
+    return await _export_users(
+        export_format=export_format, session=session,
+    )
+
+
 @private_router.get(
     "/users/{user_id}",
     response_model=PrivateDetailUserResponseModel,
@@ -59,12 +102,13 @@ async def create_user(
 )
 async def get_user(
     user_id: int,
-    user: User = Depends(admin_required),
-    session: AsyncSession = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    claims: TokenClaimsModel = Depends(admin_required),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    return await _get_user_by_id_private(
-        user_id=user_id, session=session,
-    )
+    return await read_with_fallback(session, lambda: _get_user_by_id_private(
+        user_id=user_id, session=session, if_none_match=if_none_match,
+    ))
 
 
 @private_router.patch(
@@ -75,11 +119,12 @@ async def get_user(
 async def update_user(
     user_id: int,
     body: PrivateUpdateUserModel,
-    user: User = Depends(admin_required),
+    if_match: Optional[str] = Header(None),
+    claims: TokenClaimsModel = Depends(admin_required),
     session: AsyncSession = Depends(get_db),
 ):
     return await _update_user_by_id(
-        user_id=user_id, body=body, session=session,
+        user_id=user_id, body=body, session=session, if_match=if_match,
     )
 
 
@@ -89,7 +134,7 @@ async def update_user(
 )
 async def delete_user(
     user_id: int,
-    user: User = Depends(admin_required),
+    claims: TokenClaimsModel = Depends(admin_required),
     session: AsyncSession = Depends(get_db),
 ):
     is_deleted = await _delete_user_by_id(
@@ -97,3 +142,24 @@ async def delete_user(
     )
     if is_deleted:
         return JSONResponse(status_code=204, content={})
+
+
+@private_router.get("/stats/caches", status_code=200)
+async def get_caches_statistics(
+    claims: TokenClaimsModel = Depends(admin_required),
+):
+    return get_caches_stats()
+
+
+@private_router.get("/stats/pool", status_code=200)
+async def get_pool_statistics(
+    claims: TokenClaimsModel = Depends(admin_required),
+):
+    """Replica is null when reads share the primary pool"""
+    return {
+        "primary": get_pool_stats(engine.sync_engine),
+        "replica": (
+            get_pool_stats(read_engine.sync_engine, replica_pool_stats)
+            if read_engine is not engine else None
+        ),
+    }
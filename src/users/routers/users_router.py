@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_db, get_read_db, read_with_fallback
+from src.etags import etag_matches, not_modified
+from src.responses import dump_fields
 from src.users.actions.auth_actions import get_current_user_from_token
-from src.users.actions.users_actions import _get_users, _update_user
+from src.users.actions.users_actions import (
+    _get_users,
+    _get_user_etag,
+    _update_user,
+)
 from src.users.models import User
 from src.users.schemas.users_schemas import (
     UsersListResponseModel,
@@ -21,9 +30,14 @@ users_router = APIRouter()
 async def get_users(
     page: int = Query(1, gt=0),
     size: int = Query(20, gt=0),
-    session: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_db),
 ):
-    return await _get_users(page=page, size=size, session=session)
+    return await read_with_fallback(session, lambda: _get_users(
+        page=page, size=size, session=session, cursor=cursor,
+        if_none_match=if_none_match,
+    ))
 
 
 @users_router.get(
@@ -32,10 +46,16 @@ async def get_users(
     status_code=200,
 )
 async def get_current_user(
+    if_none_match: Optional[str] = Header(None),
     user: User = Depends(get_current_user_from_token),
-    session: AsyncSession = Depends(get_db),
 ):
-    return user
+    etag = _get_user_etag(user.id, user.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return ORJSONResponse(
+        content=dump_fields(user, CurrentUserResponseModel),
+        headers={"ETag": etag},
+    )
 
 
 @users_router.patch(
@@ -45,9 +65,10 @@ async def get_current_user(
 )
 async def update_current_user(
     body: UpdateUserModel,
+    if_match: Optional[str] = Header(None),
     user: User = Depends(get_current_user_from_token),
     session: AsyncSession = Depends(get_db),
 ):
     return await _update_user(
-        user_id=user.id, body=body, session=session,
+        user_id=user.id, body=body, session=session, if_match=if_match,
     )
@@ -4,3 +4,10 @@ from pydantic import BaseModel
 class LoginModel(BaseModel):
     login: str
     password: str
+
+
+class TokenClaimsModel(BaseModel):
+    user_id: int
+    email: str
+    is_admin: bool
+    token_version: int
@@ -98,3 +98,16 @@ class PrivateUsersListMetaDataModel(TunedModel):
 class PrivateUsersListResponseModel(TunedModel):
     data: List[UsersListElementModel]
     meta: PrivateUsersListMetaDataModel
+
+
+class PrivateBulkCreateUserResultModel(TunedModel):
+    index: int
+    id: Optional[int] = None
+    email: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PrivateBulkCreateUsersResponseModel(TunedModel):
+    created: int
+    failed: int
+    results: List[PrivateBulkCreateUserResultModel]
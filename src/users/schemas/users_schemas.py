@@ -15,7 +15,7 @@ class UpdateUserModel(BaseModel):
     other_name: Optional[str] = None
     email: Optional[EmailStr] = None
     phone: Optional[str] = None
-    birthday: Optional[str] = None
+    birthday: Optional[date] = None
 
 
 class UpdateUserResponseModel(TunedModel):
@@ -25,7 +25,7 @@ class UpdateUserResponseModel(TunedModel):
     other_name: Optional[str] = None
     email: str
     phone: Optional[str] = None
-    birthday: Optional[str] = None
+    birthday: Optional[date] = None
 
 
 class CurrentUserResponseModel(TunedModel):
@@ -49,6 +49,9 @@ class PaginatedMetaDataModel(TunedModel):
     total: int
     page: int
     size: int
+    next_cursor: Optional[str] = None
+    total_exact: bool = True
+    total_strategy: str = "exact"
 
 
 class UsersListMetaDataModel(TunedModel):
@@ -9,10 +9,17 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
-from src.database import get_db
+from src.database import get_db, get_read_db
 from src.main import app
 from src.database import Base
 from src.security import Hasher
+from src.users.caches import (
+    auth_user_cache,
+    auth_user_emails,
+    token_version_cache,
+    verified_token_cache,
+    users_list_cache,
+)
 from src.users.models import User, City
 from src.users.dals import UserDAL
 
@@ -31,6 +38,7 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 app.dependency_overrides[get_db] = override_get_async_session
+app.dependency_overrides[get_read_db] = override_get_async_session
 
 
 @pytest.fixture(autouse=True, scope='session')
@@ -42,6 +50,13 @@ async def prepare_database():
         await conn.run_sync(metadata.drop_all)
 
 
+@pytest.fixture(autouse=True)
+async def invalidate_users_list_cache():
+    """Fixtures and tests delete users behind the DAL's back"""
+    await users_list_cache.invalidate()
+    yield
+
+
 # SETUP
 @pytest.fixture(scope='session')
 def event_loop(request):
@@ -96,6 +111,10 @@ async def admin_user():
     async with async_session_maker() as session:
         await session.execute(delete(User).where(User.email == "admin@admin.ru"))
         await session.commit()
+    auth_user_cache.clear()
+    auth_user_emails.clear()
+    token_version_cache.clear()
+    verified_token_cache.clear()
 
 
 @pytest.fixture
@@ -156,6 +175,10 @@ async def user():
         await session.execute(
             delete(User).where(User.email == "user@user.ru"))
         await session.commit()
+    auth_user_cache.clear()
+    auth_user_emails.clear()
+    token_version_cache.clear()
+    verified_token_cache.clear()
 
 
 @pytest.fixture
@@ -1,6 +1,27 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import settings
+from src.security import Hasher, PasswordHasherUnavailable
 from tests.conftest import client
 
 
+@pytest.fixture
+def small_hasher(monkeypatch):
+    """One worker and no queue, threads instead of bcrypt processes"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(settings, "PASSWORD_HASHER_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "PASSWORD_HASHER_QUEUE_SIZE", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASHER_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(Hasher, "_executor", executor)
+    monkeypatch.setattr(Hasher, "_slots", None)
+    yield
+    executor.shutdown(wait=False)
+
+
 async def test_login_handler(admin_user):
     admin, user_data, password = admin_user
     data = {
@@ -60,3 +81,46 @@ async def test_logout_handler(admin_user):
     )
     assert response.status_code == 200
     assert "Authorization" not in response.cookies
+
+
+async def test_hasher_async_api(small_hasher, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASHER_TIMEOUT_SECONDS", 30.0)
+    hashed_password = await Hasher.get_password_hash_async("secret")
+    assert await Hasher.verify_password_async("secret", hashed_password)
+    assert not await Hasher.verify_password_async("wrong", hashed_password)
+
+
+async def test_hasher_rejects_when_saturated(small_hasher):
+    release = threading.Event()
+    busy = asyncio.ensure_future(Hasher._run(release.wait, 10))
+    await asyncio.sleep(0)
+    try:
+        with pytest.raises(PasswordHasherUnavailable):
+            await Hasher._run(str, 1)
+    finally:
+        release.set()
+        await busy
+
+
+async def test_hasher_timeout_keeps_slot_until_job_finishes(small_hasher):
+    release = threading.Event()
+    with pytest.raises(PasswordHasherUnavailable):
+        await Hasher._run(release.wait)
+    # the job still runs in the pool and holds the only slot
+    with pytest.raises(PasswordHasherUnavailable):
+        await Hasher._run(str, 1)
+    release.set()
+    while Hasher._get_slots().locked():
+        await asyncio.sleep(0.01)
+    assert await Hasher._run(str, 1) == "1"
+
+
+async def test_login_when_hasher_saturated(admin_user, monkeypatch):
+    admin, user_data, password = admin_user
+    monkeypatch.setattr(Hasher, "_slots", asyncio.Semaphore(0))
+    response = client.post(
+        "/login",
+        json={"login": user_data["email"], "password": password},
+    )
+    assert response.status_code == 503
+    assert "Authorization" not in response.cookies
@@ -1,4 +1,11 @@
-from tests.conftest import client
+import asyncio
+import json
+
+from sqlalchemy import delete
+
+from src.users.dals import CityDAL
+from src.users.models import User, City
+from tests.conftest import client, async_session_maker
 
 
 async def test_private_users_handler_with_admin(
@@ -127,3 +134,303 @@ async def test_delete_user_by_id(
         headers=headers,
     )
     assert response.status_code == 204
+
+
+async def test_update_admin_flag_revokes_tokens(
+        authorized_admin_client, authorized_user_client
+):
+    admin_cookies, *_ = authorized_admin_client
+    user_cookies, user, user_data, password = authorized_user_client
+    admin_headers = {
+        "Cookie": f"Authorization={admin_cookies['Authorization']}"
+    }
+    user_headers = {
+        "Cookie": f"Authorization={user_cookies['Authorization']}"
+    }
+    response = client.get("/users/current", headers=user_headers)
+    assert response.json()["is_admin"] is False
+    response = client.patch(
+        f"/private/users/{user.id}",
+        json={"id": user.id, "is_admin": True},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    response = client.get("/users/current", headers=user_headers)
+    assert response.status_code == 401
+
+    response = client.post(
+        "/login", json={"login": user_data["email"], "password": password},
+    )
+    assert response.status_code == 200
+    assert response.json()["is_admin"] is True
+
+
+async def test_update_unchanged_admin_flag_keeps_tokens(
+        authorized_admin_client, authorized_user_client
+):
+    admin_cookies, *_ = authorized_admin_client
+    user_cookies, user, user_data, password = authorized_user_client
+    admin_headers = {
+        "Cookie": f"Authorization={admin_cookies['Authorization']}"
+    }
+    user_headers = {
+        "Cookie": f"Authorization={user_cookies['Authorization']}"
+    }
+    response = client.patch(
+        f"/private/users/{user.id}",
+        json={
+            "id": user.id,
+            "is_admin": False,
+            "email": user_data["email"],
+            "first_name": "edited",
+        },
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    response = client.get("/users/current", headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "edited"
+
+
+async def test_caches_stats(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.get("/private/stats/caches", headers=headers)
+    assert response.status_code == 200
+    assert "hits" in response.json()["auth_user"]
+    assert "misses" in response.json()["auth_user"]
+    response = client.get("/private/stats/caches", headers=headers)
+    assert response.json()["verified_token"]["hits"] >= 1
+
+
+async def test_private_bulk_create_users(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}",
+        "Content-Type": "application/x-ndjson",
+    }
+    rows = [
+        '{"first_name": "bulk", "last_name": "bulk", '
+        '"email": "bulk1@test.ru", "is_admin": false, "password": "bulk"}',
+        '{"first_name": "bulk", "last_name": "bulk", '
+        '"email": "bulk1@test.ru", "is_admin": false, "password": "bulk"}',
+        '{"first_name": "bulk", "last_name": "bulk", '
+        f'"email": "{admin.email}", "is_admin": false, "password": "bulk"}}',
+        '{"first_name": "bulk"}',
+        "not json",
+    ]
+    response = client.post(
+        "/private/users/bulk",
+        content="\n".join(rows),
+        headers=headers,
+    )
+    async with async_session_maker() as session:
+        await session.execute(
+            delete(User).where(User.email == "bulk1@test.ru"))
+        await session.commit()
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["failed"] == 4
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert results[0]["id"] is not None
+    assert results[1]["error"] == "Почта уже используется"
+    assert results[2]["error"] == "Почта уже используется"
+    assert results[3]["error"] is not None
+    assert results[4]["error"] == "Некорректный JSON"
+
+
+async def test_private_export_users(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.get("/private/users/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert admin.email in [row["email"] for row in rows]
+
+    response = client.get(
+        "/private/users/export",
+        params={"format": "csv"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,first_name,last_name")
+    assert any(admin.email in line for line in lines[1:])
+
+
+async def test_pool_stats(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.get("/private/stats/pool", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    for key in ("checked_out", "idle", "overflow", "acquire_wait_seconds_max"):
+        assert key in stats["primary"]
+    assert "replica" in stats
+
+
+async def test_private_create_user_concurrent_duplicates(
+        ac, authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    data = {
+        "first_name": "race",
+        "last_name": "race",
+        "email": "race@test.ru",
+        "is_admin": False,
+        "password": "race",
+    }
+    responses = await asyncio.gather(*(
+        ac.post("/private/users", json=data, headers=headers)
+        for _ in range(5)
+    ))
+    async with async_session_maker() as session:
+        await session.execute(
+            delete(User).where(User.email == "race@test.ru"))
+        await session.commit()
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [201, 400, 400, 400, 400]
+    for response in responses:
+        if response.status_code == 400:
+            assert response.json() == {
+                "code": 400, "message": "Почта уже используется",
+            }
+
+
+async def test_private_update_user_email_conflict(
+        authorized_admin_client, user
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    other_user, *_ = user
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.patch(
+        f"/private/users/{other_user.id}",
+        json={"id": other_user.id, "email": admin.email},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json() == {
+        "code": 400, "message": "Почта уже используется",
+    }
+
+
+async def test_private_update_unknown_user(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.patch(
+        "/private/users/0",
+        json={"id": 0, "first_name": "new"},
+        headers=headers,
+    )
+    assert response.status_code == 404
+
+
+async def test_delete_user_revokes_tokens(
+        authorized_admin_client, authorized_user_client
+):
+    admin_cookies, *_ = authorized_admin_client
+    user_cookies, user, user_data, password = authorized_user_client
+    admin_headers = {
+        "Cookie": f"Authorization={admin_cookies['Authorization']}"
+    }
+    user_headers = {
+        "Cookie": f"Authorization={user_cookies['Authorization']}"
+    }
+    assert client.get(
+        "/users/current", headers=user_headers).status_code == 200
+    response = client.delete(
+        f"/private/users/{user.id}", headers=admin_headers,
+    )
+    assert response.status_code == 204
+    assert client.get(
+        "/users/current", headers=user_headers).status_code == 401
+
+
+async def test_private_users_hint_only_page_cities(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    async with async_session_maker() as session:
+        async with session.begin():
+            city_dal = CityDAL(session)
+            page_city = await city_dal.create_city("Казань")
+            other_city = await city_dal.create_city("Самара")
+    try:
+        response = client.patch(
+            f"/private/users/{admin.id}",
+            json={"id": admin.id, "city": page_city.id},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        response = client.get("/private/users", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["meta"]["hint"]["city"] == [
+            {"id": page_city.id, "name": "Казань"},
+        ]
+    finally:
+        async with async_session_maker() as session:
+            async with session.begin():
+                await session.execute(
+                    delete(City).where(
+                        City.id.in_([page_city.id, other_city.id])
+                    )
+                )
+
+
+async def test_private_get_user_and_list_not_modified(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    for url in (f"/private/users/{admin.id}", "/private/users"):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        response = client.get(
+            url, headers={**headers, "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+
+    response = client.patch(
+        f"/private/users/{admin.id}",
+        json={"id": admin.id, "last_name": "changed"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    response = client.get(
+        "/private/users", headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
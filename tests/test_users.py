@@ -1,4 +1,19 @@
-from tests.conftest import client
+import base64
+
+import pytest
+from sqlalchemy import delete, event, func, select, text
+
+from src.users import dals
+from src.users.actions import users_actions
+from src.users.caches import users_list_cache
+from src.users.counters import (
+    CachedUsersCount,
+    CounterUsersCount,
+    EstimatedUsersCount,
+)
+from src.users.dals import UserDAL
+from src.users.models import User
+from tests.conftest import client, async_session_maker, engine_test
 
 
 async def test_get_users(
@@ -59,3 +74,281 @@ async def test_update_current_user(
     assert response.json()["first_name"] == data["first_name"]
     assert response.json()["last_name"] == data["last_name"]
     assert response.json()["email"] == user_data["email"]
+
+
+async def test_get_current_user_not_modified(
+        authorized_user_client
+):
+    cookies, user, user_data, password = authorized_user_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    response = client.get("/users/current", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/users/current", headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+async def test_update_current_user_if_match(
+        authorized_user_client
+):
+    cookies, user, user_data, password = authorized_user_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    etag = client.get("/users/current", headers=headers).headers["ETag"]
+    response = client.patch(
+        "/users/current",
+        json={"first_name": "first"},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    response = client.patch(
+        "/users/current",
+        json={"first_name": "second"},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+    response = client.get("/users/current", headers=headers)
+    assert response.json()["first_name"] == "first"
+
+
+async def test_get_users_with_cursor(
+        authorized_admin_client, authorized_user_client
+):
+    response = client.get("/users/", params={"size": 1})
+    assert response.status_code == 200
+    first_page = response.json()
+    next_cursor = first_page["meta"]["pagination"]["next_cursor"]
+    assert next_cursor is not None
+
+    response = client.get(
+        "/users/", params={"size": 1, "cursor": next_cursor},
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page["data"]) == 1
+    assert second_page["data"][0]["id"] > first_page["data"][0]["id"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "invalid",
+    "é",
+    "١٢",
+    base64.urlsafe_b64encode("id:²".encode()).decode(),
+    base64.urlsafe_b64encode(b"id:2147483648").decode(),
+    base64.urlsafe_b64encode(b"id:").decode(),
+])
+async def test_get_users_with_invalid_cursor(cursor):
+    response = client.get("/users/", params={"cursor": cursor})
+    assert response.status_code == 422
+
+
+async def test_get_users_reports_total_strategy():
+    response = client.get("/users/")
+    assert response.status_code == 200
+    pagination = response.json()["meta"]["pagination"]
+    assert pagination["total_strategy"] == "exact"
+    assert pagination["total_exact"] is True
+
+
+def _use_users_count(monkeypatch, strategy):
+    monkeypatch.setattr(users_actions, "users_count", strategy)
+    monkeypatch.setattr(dals, "users_count", strategy)
+
+
+async def _get_pagination() -> dict:
+    await users_list_cache.invalidate()
+    response = client.get("/users/")
+    assert response.status_code == 200
+    return response.json()["meta"]["pagination"]
+
+
+async def _create_user(session, email: str) -> User:
+    return await UserDAL(session).create_user(
+        first_name="count", last_name="count", other_name=None,
+        email=email, phone=None, birthday=None, city=None,
+        additional_info=None, is_admin=False, hashed_password="count",
+    )
+
+
+async def _delete_users(*emails: str) -> None:
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(delete(User).where(User.email.in_(emails)))
+
+
+async def test_users_total_cached_strategy(
+        monkeypatch, authorized_admin_client
+):
+    _use_users_count(monkeypatch, CachedUsersCount(ttl=60))
+    pagination = await _get_pagination()
+    assert pagination["total_strategy"] == "cached"
+    assert pagination["total_exact"] is False
+    total = pagination["total"]
+    try:
+        async with async_session_maker() as session:
+            async with session.begin():
+                await _create_user(session, "cached@test.ru")
+        assert (await _get_pagination())["total"] == total
+    finally:
+        await _delete_users("cached@test.ru")
+
+
+async def test_users_total_counter_strategy(
+        monkeypatch, authorized_admin_client
+):
+    _use_users_count(monkeypatch, CounterUsersCount(ttl=60))
+    pagination = await _get_pagination()
+    assert pagination["total_strategy"] == "counter"
+    assert pagination["total_exact"] is False
+    total = pagination["total"]
+    try:
+        async with async_session_maker() as session:
+            async with session.begin():
+                user = await _create_user(session, "counter@test.ru")
+        assert (await _get_pagination())["total"] == total + 1
+
+        with pytest.raises(RuntimeError):
+            async with async_session_maker() as session:
+                async with session.begin():
+                    await _create_user(session, "rollback@test.ru")
+                    raise RuntimeError
+        assert (await _get_pagination())["total"] == total + 1
+
+        for _ in range(2):
+            async with async_session_maker() as session:
+                async with session.begin():
+                    await UserDAL(session).delete_user(user.id)
+        assert (await _get_pagination())["total"] == total
+    finally:
+        await _delete_users("counter@test.ru")
+
+
+async def test_users_total_estimate_strategy(
+        monkeypatch, authorized_admin_client
+):
+    _use_users_count(monkeypatch, EstimatedUsersCount())
+    async with async_session_maker() as session:
+        await session.execute(text('ANALYZE "user"'))
+        rows = await session.scalar(
+            select(func.count()).select_from(User)
+            .where(User.is_active == True)
+        )
+    pagination = await _get_pagination()
+    assert pagination["total_strategy"] == "estimate"
+    assert pagination["total_exact"] is False
+    # same meaning as the exact count, soft deleted users are left out
+    assert pagination["total"] == rows
+
+
+async def test_metrics():
+    client.get("/users/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/users/",status="200"}' \
+        in response.text
+    assert "http_request_duration_seconds_bucket" in response.text
+
+
+async def test_get_users_cached_until_write(
+        authorized_admin_client
+):
+    cookies, admin, user_data, password = authorized_admin_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    first = client.get("/users/")
+    hits = users_list_cache.hits
+    second = client.get("/users/")
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert users_list_cache.hits == hits + 1
+
+    response = client.patch(
+        f"/private/users/{admin.id}",
+        json={"id": admin.id, "last_name": "cached"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    third = client.get("/users/")
+    assert third.headers["ETag"] != first.headers["ETag"]
+    assert any(
+        user["last_name"] == "cached" for user in third.json()["data"]
+    )
+
+
+async def test_get_users_stale_etag_reads_page_once():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        statements.append(statement)
+
+    await users_list_cache.invalidate()
+    event.listen(
+        engine_test.sync_engine, "before_cursor_execute", before_cursor_execute,
+    )
+    try:
+        response = client.get("/users/", headers={"If-None-Match": 'W/"0"'})
+    finally:
+        event.remove(
+            engine_test.sync_engine, "before_cursor_execute",
+            before_cursor_execute,
+        )
+    assert response.status_code == 200
+    pages = [statement for statement in statements if "LIMIT" in statement]
+    assert len(pages) == 1
+
+    response = client.get(
+        "/users/", headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+async def test_get_users_from_replica_cached_briefly(monkeypatch):
+    monkeypatch.setattr(users_actions, "used_replica", lambda session: True)
+    monkeypatch.setattr(
+        users_actions.settings, "USERS_LIST_CACHE_REPLICA_TTL_SECONDS", 0,
+    )
+    client.get("/users/")
+    hits = users_list_cache.hits
+    response = client.get("/users/")
+    assert response.status_code == 200
+    assert users_list_cache.hits == hits
+
+
+async def test_caches_not_refilled_before_commit(
+        authorized_user_client
+):
+    cookies, user, user_data, password = authorized_user_client
+    headers = {
+        "Cookie": f"Authorization={cookies['Authorization']}"
+    }
+    client.get("/users/current", headers=headers)
+    async with async_session_maker() as session:
+        async with session.begin():
+            await UserDAL(session).update_user(
+                user.id, {"first_name": "committed"},
+            )
+            # reads in between still see the old row and may cache it
+            response = client.get("/users/current", headers=headers)
+            assert response.json()["first_name"] == user_data["first_name"]
+            response = client.get("/users/")
+            assert all(
+                row["first_name"] != "committed"
+                for row in response.json()["data"]
+            )
+
+    response = client.get("/users/current", headers=headers)
+    assert response.json()["first_name"] == "committed"
+    response = client.get("/users/")
+    assert any(
+        row["first_name"] == "committed" for row in response.json()["data"]
+    )